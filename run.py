@@ -5,21 +5,29 @@ Usage: python run.py "Analyze ROAS drop in last 7 days"
 import sys
 import logging
 from pathlib import Path
-from dotenv import load_dotenv
 
 from src.utils.config import load_config, setup_logging
-from src.orchestrator import AgentOrchestrator
 from src.utils.exceptions import SchemaError, DataValidationError
 
-# Load environment variables from .env file
-load_dotenv()
-
 logger = logging.getLogger(__name__)
 
 
 def main():
     """Main execution function"""
     
+    # Get user query from command line (before any heavy imports, so the
+    # usage message returns immediately)
+    if len(sys.argv) < 2:
+        print("Usage: python run.py \"<your query>\"")
+        print("Example: python run.py \"Analyze ROAS drop in last 7 days\"")
+        sys.exit(1)
+    
+    user_query = sys.argv[1]
+    
+    # Load environment variables from .env file (CLI only, not on import)
+    from dotenv import load_dotenv
+    load_dotenv()
+    
     # Load configuration
     try:
         config = load_config("config/config.yaml")
@@ -28,20 +36,14 @@ def main():
         print(f"ERROR: Failed to load configuration: {e}")
         sys.exit(1)
     
-    # Get user query from command line
-    if len(sys.argv) < 2:
-        print("Usage: python run.py \"<your query>\"")
-        print("Example: python run.py \"Analyze ROAS drop in last 7 days\"")
-        sys.exit(1)
-    
-    user_query = sys.argv[1]
-    
     # Initialize orchestrator
     try:
         logger.info("=" * 80)
         logger.info("Kasparro Agentic FB Analyst Starting")
         logger.info("=" * 80)
         
+        # Deferred: pulls in pandas/numpy and every agent
+        from src.orchestrator import AgentOrchestrator
         orchestrator = AgentOrchestrator(config)
         
         # Run analysis
@@ -8,6 +8,8 @@ This script:
 4. Restores original CSV
 """
 
+import os
+import numpy as np
 import pandas as pd
 import shutil
 from pathlib import Path
@@ -15,6 +17,36 @@ from pathlib import Path
 # Paths
 csv_path = Path("synthetic_fb_ads_undergarments.csv")
 backup_path = Path("synthetic_fb_ads_undergarments_backup.csv")
+tmp_path = csv_path.with_suffix(".csv.tmp")
+
+# Rows per chunk (bounds peak memory for large exports)
+CHUNK_SIZE = 200_000
+
+# Simulated drift: ROAS drops by 60%
+ROAS_FACTOR = 0.4
+
+
+def copy_file(src_path: Path, dst_path: Path) -> None:
+    """Copy a file in-kernel (reflink on CoW filesystems), falling back to a buffered copy"""
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    # No progress (e.g. pseudo-files): copy the rest in userspace
+                    break
+                remaining -= copied
+        except (OSError, AttributeError):
+            # Unsupported platform/filesystem: restart with a userspace copy
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+
+        # copy_file_range advances the file descriptor offsets, so this resumes
+        # where the in-kernel copy stopped (a no-op once the copy is complete)
+        shutil.copyfileobj(src, dst, length=1 << 20)
+
 
 print("=" * 70)
 print("DRIFT SIMULATION TEST")
@@ -22,20 +54,39 @@ print("=" * 70)
 
 # Step 1: Backup original
 print("\n1️⃣  Backing up original CSV...")
-shutil.copy(csv_path, backup_path)
+copy_file(csv_path, backup_path)
 print(f"   ✅ Backup created: {backup_path}")
 
-# Step 2: Load and modify data
+# Step 2: Stream data in chunks, simulate drift (drop ROAS by 60%), write to temp file
 print("\n2️⃣  Loading data and simulating ROAS drop (60%)...")
-df = pd.read_csv(csv_path)
-print(f"   Original ROAS mean: {df['roas'].mean():.2f}")
+# Only roas is parsed; every other column passes through as its original text,
+# which skips type inference on read and float formatting on write
+columns = pd.read_csv(csv_path, nrows=0).columns
+read_options = {
+    "dtype": {col: "float64" if col == "roas" else str for col in columns},
+    "keep_default_na": False,
+    "na_values": {"roas": [""]},
+}
+roas_sum = 0.0
+roas_count = 0
+
+with open(tmp_path, "w", newline="") as out:
+    for i, chunk in enumerate(pd.read_csv(csv_path, chunksize=CHUNK_SIZE, **read_options)):
+        # float64 dtype guarantees to_numpy() is a view, so the scaling happens in place
+        roas = chunk['roas'].to_numpy()
+        roas_sum += np.nansum(roas)
+        roas_count += roas.size - np.count_nonzero(np.isnan(roas))
+        np.multiply(roas, ROAS_FACTOR, out=roas)
+        chunk.to_csv(out, index=False, header=(i == 0))
 
-# Simulate drift: Drop ROAS by 60%
-df['roas'] = df['roas'] * 0.4
-print(f"   Modified ROAS mean: {df['roas'].mean():.2f} (dropped 60%)")
+# Scaling is linear, so the modified mean follows from the original one
+# without a second reduction over the column (nan when no roas values, like Series.mean())
+original_mean = roas_sum / roas_count if roas_count else float("nan")
+print(f"   Original ROAS mean: {original_mean:.2f}")
+print(f"   Modified ROAS mean: {original_mean * ROAS_FACTOR:.2f} (dropped 60%)")
 
-# Save modified data
-df.to_csv(csv_path, index=False)
+# Atomically swap in the modified data
+os.replace(tmp_path, csv_path)
 print(f"   ✅ Modified CSV saved")
 
 # Step 3: Run system
@@ -4,9 +4,12 @@ Data Agent - Loads dataset and executes analytical queries
 import pandas as pd
 import numpy as np
 import logging
+import re
 import time
-from typing import Dict, Any, List
-from src.utils.data_loader import DataLoader
+import warnings
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Tuple
+from src.utils.data_loader import DataLoader, safe_divide
 from src.utils.structured_logger import StructuredLogger
 from src.utils.threshold_manager import ThresholdManager
 from src.monitoring.metric_tracker import MetricTracker
@@ -14,6 +17,20 @@ from src.monitoring.drift_detector import DriftDetector
 
 logger = logging.getLogger(__name__)
 
+# Planner timeframes ("last_N_days"); common values resolve without parsing
+_TIMEFRAME_RE = re.compile(r'last_(\d+)_days')
+_TIMEFRAME_DAYS = {"last_7_days": 7, "last_14_days": 14, "last_30_days": 30}
+_DEFAULT_TIMEFRAME_DAYS = 7
+
+
+def _timeframe_days(timeframe: str) -> int:
+    """Number of days in a "last_N_days" timeframe (defaults to 7)"""
+    days = _TIMEFRAME_DAYS.get(timeframe)
+    if days is not None:
+        return days
+    match = _TIMEFRAME_RE.match(timeframe)
+    return int(match.group(1)) if match else _DEFAULT_TIMEFRAME_DAYS
+
 
 class DataAgent:
     """
@@ -33,6 +50,21 @@ class DataAgent:
     # Valid calculated metrics
     VALID_CALCULATED_METRICS = {'ctr', 'roas', 'cpc', 'cpm', 'cvr'}
     
+    # String dimensions grouped on by the analyses (stored as category dtype)
+    CATEGORICAL_COLUMNS = (
+        'campaign_name', 'adset_name', 'creative_type', 'creative_message',
+        'platform', 'audience_type', 'country'
+    )
+    
+    # Calculated metric -> (numerator, denominator, scale) over summed base metrics
+    RATIO_METRICS = {
+        'ctr': ('clicks', 'impressions', 1),
+        'roas': ('revenue', 'spend', 1),
+        'cvr': ('purchases', 'clicks', 1),
+        'cpc': ('spend', 'clicks', 1),
+        'cpm': ('spend', 'impressions', 1000)
+    }
+    
     def __init__(self, data_loader: DataLoader, config: Dict[str, Any] = None, structured_logger: StructuredLogger = None):
         self.loader = data_loader
         self.df = None
@@ -42,20 +74,53 @@ class DataAgent:
         # Initialize threshold manager for default threshold resolution
         self.threshold_mgr = ThresholdManager(self.config)
         
+        # Upper bound on segments returned by segment analysis when the planner
+        # gives no top_k (the best and worst halves are kept)
+        self.max_segments = self.config.get('data', {}).get('max_segments', 50)
+        
         # Initialize drift detection components
         self.metric_tracker = MetricTracker()
         self.drift_detector = DriftDetector(self.config)
         self.drift_alerts = []
         
+        # Aggregations shared across subtasks (daily, campaign/adset, per-dimension,
+        # creative), computed once per dataframe
+        self._agg_cache: Dict[Any, Any] = {}
+        self._agg_cache_df = None
+        
     def initialize(self):
         """Load the dataset and check for metric drift"""
         self.df = self.loader.load()
+        self._derive_row_metrics()
+        self._categorize_dimensions()
+        
+        # Precompute static dataset context (reused by every insight call)
+        self._get_dimension_counts()
         
         # Perform drift detection
         self._check_drift()
         
         logger.info("Data Agent initialized")
         
+    def _derive_row_metrics(self):
+        """
+        Make row-level ctr/roas part of the loaded frame when the source lacks them
+        
+        Creative analysis averages these per row. Columns present in the CSV are
+        kept as-is (e.g. drift-simulated roas is not derived from revenue/spend).
+        """
+        for metric in ('ctr', 'roas'):
+            numerator, denominator, _ = self.RATIO_METRICS[metric]
+            if metric not in self.df.columns and {numerator, denominator} <= set(self.df.columns):
+                self.df[metric] = safe_divide(self.df[numerator], self.df[denominator])
+        
+    def _categorize_dimensions(self):
+        """Store low-cardinality string dimensions as category dtype so groupby hashes integer codes"""
+        for col in self.CATEGORICAL_COLUMNS:
+            if col in self.df.columns and self.df[col].dtype == object:
+                self.df[col] = self.df[col].astype('category')
+        self._agg_cache_df = None  # columns changed in place; drop cached aggregations
+        
     def _normalize_metric(self, metric: str) -> str:
         """
         Validate and normalize metric names, mapping aliases to actual column names
@@ -171,26 +236,20 @@ class DataAgent:
             metric = "roas"
         
         # Extract number of days
-        days = int(timeframe.split("_")[1]) if "last_" in timeframe else 7
-        
-        # Get daily aggregated data
-        daily = self.df.groupby('date').agg({
-            'spend': 'sum',
-            'revenue': 'sum',
-            'impressions': 'sum',
-            'clicks': 'sum',
-            'purchases': 'sum'
-        }).reset_index()
-        
-        daily['roas'] = daily['revenue'] / daily['spend'].replace(0, np.nan)
-        daily['ctr'] = daily['clicks'] / daily['impressions'].replace(0, np.nan)
-        
-        # Get recent period
-        recent_data = daily.tail(days)
-        previous_data = daily.head(len(daily) - days).tail(days)
-        
-        recent_avg = recent_data[metric].mean()
-        previous_avg = previous_data[metric].mean()
+        days = _timeframe_days(timeframe)
+        
+        # Daily metric values (date-sorted), sliced into recent and previous windows
+        values = self._get_daily_arrays()[metric]
+        n = len(values)
+        recent = values[max(0, n - days):]
+        head = values[:n - days]
+        previous = head[max(0, len(head) - days):]
+        
+        with warnings.catch_warnings():
+            # Empty / all-NaN windows give NaN, as pandas' mean() did
+            warnings.simplefilter("ignore", RuntimeWarning)
+            recent_avg = np.nanmean(recent)
+            previous_avg = np.nanmean(previous)
         change_pct = ((recent_avg - previous_avg) / previous_avg * 100) if previous_avg != 0 else 0
         
         return {
@@ -200,7 +259,7 @@ class DataAgent:
             "previous_avg": float(previous_avg),
             "change_pct": float(change_pct),
             "trend": "increasing" if change_pct > 0 else "decreasing",
-            "daily_values": recent_data[[metric]].tail(7).to_dict('records')
+            "daily_values": [{metric: value} for value in recent[-7:].tolist()]
         }
     
     def _identify_underperformers(self, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -251,32 +310,25 @@ class DataAgent:
             metric = "ctr"
         
         # Group by campaign and adset
-        grouped = self.df.groupby(['campaign_name', 'adset_name']).agg({
-            'spend': 'sum',
-            'impressions': 'sum',
-            'clicks': 'sum',
-            'purchases': 'sum',
-            'revenue': 'sum'
-        }).reset_index()
+        grouped = self._get_by_campaign_adset()
         
-        # Calculate metrics
-        grouped['ctr'] = grouped['clicks'] / grouped['impressions'].replace(0, np.nan)
-        grouped['roas'] = grouped['revenue'] / grouped['spend'].replace(0, np.nan)
-        grouped['cvr'] = grouped['purchases'] / grouped['clicks'].replace(0, np.nan)
-        grouped['cpc'] = grouped['spend'] / grouped['clicks'].replace(0, np.nan)
-        grouped['cpm'] = (grouped['spend'] / grouped['impressions'].replace(0, np.nan)) * 1000
-        
-        # Filter underperformers (handle both zero and low values)
+        # Filter underperformers (handle both zero and low values) on the raw arrays;
+        # only the worst 10 are returned, so rank the matching positions with a
+        # partial sort and copy just those rows out of the grouped frame
+        values = grouped[metric].to_numpy()
         if metric in ['revenue', 'purchases']:  # For "zero sales/revenue" queries
-            underperformers = grouped[grouped[metric] <= threshold].sort_values('spend', ascending=False)
+            matches = np.flatnonzero(values <= threshold)
+            worst = self._top_k_positions(grouped['spend'].to_numpy()[matches], 10, largest=True)
         else:
-            underperformers = grouped[grouped[metric] < threshold].sort_values(metric)
+            matches = np.flatnonzero(values < threshold)
+            worst = self._top_k_positions(values[matches], 10)
+        top_underperformers = grouped.iloc[matches[worst]]
         
         return {
             "metric": metric,
             "threshold": threshold,
-            "count": len(underperformers),
-            "top_underperformers": underperformers.head(10).to_dict('records')
+            "count": len(matches),
+            "top_underperformers": top_underperformers.reset_index().to_dict('records')
         }
     
     def _segment_analysis(self, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -292,35 +344,45 @@ class DataAgent:
             metric = "roas"
         
         # Group by dimension
-        grouped = self.df.groupby(dimension).agg({
-            'spend': 'sum',
-            'revenue': 'sum',
-            'impressions': 'sum',
-            'clicks': 'sum',
-            'purchases': 'sum'
-        }).reset_index()
-        
-        grouped['roas'] = grouped['revenue'] / grouped['spend'].replace(0, np.nan)
-        grouped['ctr'] = grouped['clicks'] / grouped['impressions'].replace(0, np.nan)
+        grouped = self._get_by_dimension(dimension)
+        
+        # Highest metric first; segments with an undefined metric (NaN) rank last
+        ranked = grouped.sort_values(metric, ascending=False, na_position="last")
+        
+        # Cap serialized segments: the planner's top_k keeps the best ones, the
+        # data.max_segments default keeps both ends so the worst segments survive
+        top_k = self._parse_top_k(params.get("top_k"))
+        if top_k is not None:
+            segments = ranked.head(top_k)
+        elif len(ranked) > self.max_segments:
+            best = (self.max_segments + 1) // 2
+            segments = pd.concat([ranked.head(best), ranked.tail(self.max_segments - best)])
+        else:
+            segments = ranked
         
         return {
             "dimension": dimension,
             "metric": metric,
-            "segments": grouped.sort_values(metric, ascending=False).to_dict('records')
+            "segments": segments.reset_index().to_dict('records'),
+            "total_segments": len(ranked),
+            "truncated": len(segments) < len(ranked)
         }
     
+    @staticmethod
+    def _parse_top_k(raw_top_k: Any) -> Optional[int]:
+        """Planner-supplied segment cap (at least 1), or None when missing/invalid"""
+        if raw_top_k is None or raw_top_k == "":
+            return None
+        try:
+            return max(1, int(raw_top_k))
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid top_k '{raw_top_k}', using the default segment cap")
+            return None
+    
     def _creative_analysis(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze creative performance"""
         # Get creative performance by type and message
-        creative_perf = self.df.groupby(['creative_type', 'creative_message']).agg({
-            'spend': 'sum',
-            'impressions': 'sum',
-            'clicks': 'sum',
-            'ctr': 'mean',
-            'purchases': 'sum',
-            'revenue': 'sum',
-            'roas': 'mean'
-        }).reset_index()
+        creative_perf = self._get_by_creative()
         
         # Sort by CTR
         top_performers = creative_perf.nlargest(10, 'ctr')
@@ -328,25 +390,177 @@ class DataAgent:
         
         return {
             "total_creative_variants": len(creative_perf),
-            "top_performers": top_performers.to_dict('records'),
-            "bottom_performers": bottom_performers.to_dict('records'),
-            "creative_type_summary": self.df.groupby('creative_type')['ctr'].mean().to_dict()
+            "top_performers": top_performers.reset_index().to_dict('records'),
+            "bottom_performers": bottom_performers.reset_index().to_dict('records'),
+            "creative_type_summary": self.df.groupby('creative_type', observed=True)['ctr'].mean().to_dict()
         }
     
+    # Cached aggregations (treated as read-only by the analysis methods; group
+    # keys are kept in the index)
+    
+    def _cached(self, key: Any, build) -> Any:
+        """Return a cached aggregation, rebuilding the cache if self.df was replaced"""
+        if self._agg_cache_df is not self.df:
+            self._agg_cache = {}
+            self._agg_cache_df = self.df
+        
+        if key not in self._agg_cache:
+            self._agg_cache[key] = build()
+        return self._agg_cache[key]
+    
+    def _group_sums(self, keys, columns: List[str]) -> pd.DataFrame:
+        """
+        Sum columns per group in one pass
+        
+        Selecting the columns and calling .sum() runs a single Cython reduction over
+        all of them, instead of dispatching per column as agg({...: 'sum'}) does.
+        Group keys stay in the index; callers reset_index() only on the rows they
+        serialize.
+        """
+        return self.df.groupby(keys, observed=True)[columns].sum()
+    
+    def _with_ratio_metrics(self, frame: pd.DataFrame, metrics: List[str]) -> pd.DataFrame:
+        """
+        Derive ratio metrics from summed base columns in one block
+        
+        Each base column is pulled to NumPy once and each denominator's zero-mask is
+        built once, then all requested metrics are divided and assigned together.
+        Zero denominators give NaN.
+        """
+        arrays = {}
+        masks = {}
+        derived = {}
+        for metric in metrics:
+            numerator, denominator, scale = self.RATIO_METRICS[metric]
+            for col in (numerator, denominator):
+                if col not in arrays:
+                    arrays[col] = frame[col].to_numpy(dtype=np.float64)
+            if denominator not in masks:
+                masks[denominator] = arrays[denominator] != 0
+            
+            values = np.full(len(frame), np.nan)
+            np.divide(arrays[numerator], arrays[denominator], out=values, where=masks[denominator])
+            if scale != 1:
+                values *= scale
+            derived[metric] = values
+        
+        return frame.assign(**derived)
+    
+    def _grouped_with_metrics(
+        self,
+        by: Tuple[str, ...],
+        columns: Tuple[str, ...],
+        metrics: Tuple[str, ...]
+    ) -> pd.DataFrame:
+        """
+        Shared groupby pipeline: sum base columns per group, then derive ratio metrics
+        
+        Memoized per (by, columns, metrics) in the aggregation cache, so every
+        analysis grouping on the same keys reuses one scan of self.df. Column order
+        is part of the key because it carries through to the serialized records.
+        """
+        keys = by[0] if len(by) == 1 else list(by)
+        return self._cached(
+            ('grouped', by, columns, metrics),
+            lambda: self._with_ratio_metrics(self._group_sums(keys, list(columns)), list(metrics))
+        )
+    
+    def _get_daily(self) -> pd.DataFrame:
+        """Daily totals with derived ratio metrics"""
+        return self._grouped_with_metrics(
+            ('date',),
+            ('spend', 'revenue', 'impressions', 'clicks', 'purchases'),
+            ('roas', 'ctr', 'cvr', 'cpc', 'cpm')
+        )
+    
+    def _get_daily_arrays(self) -> Dict[str, np.ndarray]:
+        """Date-sorted NumPy column arrays of the daily frame, for window slicing"""
+        return self._cached('daily_arrays', lambda: {
+            col: self._get_daily()[col].to_numpy()
+            for col in self._get_daily().columns
+        })
+    
+    def _get_by_campaign_adset(self) -> pd.DataFrame:
+        """Campaign/adset totals with derived ratio metrics"""
+        return self._grouped_with_metrics(
+            ('campaign_name', 'adset_name'),
+            ('spend', 'impressions', 'clicks', 'purchases', 'revenue'),
+            ('ctr', 'roas', 'cvr', 'cpc', 'cpm')
+        )
+    
+    def _get_by_dimension(self, dimension: str) -> pd.DataFrame:
+        """Per-segment totals for one dimension with ROAS/CTR"""
+        return self._grouped_with_metrics(
+            (dimension,),
+            ('spend', 'revenue', 'impressions', 'clicks', 'purchases'),
+            ('roas', 'ctr')
+        )
+    
+    def _get_dimension_counts(self) -> Mapping[str, Mapping[str, int]]:
+        """
+        Value counts of the context dimensions (unique dimensions for insight context)
+        
+        Returned as read-only views of the cached dicts, so every caller shares the
+        same objects and none of them can mutate the cache.
+        """
+        return self._cached('dimension_counts', lambda: MappingProxyType({
+            "creative_types": MappingProxyType(self._value_counts(self.df['creative_type'])),
+            "platforms": MappingProxyType(self._value_counts(self.df['platform'])),
+            "audience_types": MappingProxyType(self._value_counts(self.df['audience_type'])),
+            "countries": MappingProxyType(self._value_counts(self.df['country']))
+        }))
+    
+    @staticmethod
+    def _value_counts(series: pd.Series) -> Dict[str, int]:
+        """
+        value_counts().to_dict() equivalent (most frequent first, NaN excluded)
+        
+        For category columns this is a single np.bincount over the integer codes.
+        """
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            return series.value_counts().to_dict()
+        
+        codes = series.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+        order = np.argsort(-counts, kind='stable')
+        order = order[counts[order] > 0]
+        return dict(zip(series.cat.categories[order].tolist(), counts[order].tolist()))
+    
+    @staticmethod
+    def _top_k_positions(values: np.ndarray, k: int, largest: bool = False) -> np.ndarray:
+        """
+        Positions of the k smallest (or largest) values, in nsmallest/nlargest order
+        
+        np.partition finds the k-th value in linear time; only the values up to it
+        are then stable-sorted, so ties keep their original order (keep='first').
+        """
+        if largest:
+            values = -values
+        if len(values) > k:
+            kth = np.partition(values, k - 1)[k - 1]
+            candidates = np.flatnonzero(values <= kth)
+        else:
+            candidates = np.arange(len(values))
+        return candidates[np.argsort(values[candidates], kind='stable')[:k]]
+    
+    def _get_by_creative(self) -> pd.DataFrame:
+        """Creative type/message performance"""
+        return self._cached('creative', lambda: self.df.groupby(['creative_type', 'creative_message'], observed=True).agg({
+            'spend': 'sum',
+            'impressions': 'sum',
+            'clicks': 'sum',
+            'ctr': 'mean',
+            'purchases': 'sum',
+            'revenue': 'sum',
+            'roas': 'mean'
+        }))
+    
     def get_context_for_insights(self) -> Dict[str, Any]:
         """Prepare dataset context for insight generation"""
-        # Get unique dimensions for context
-        dimensions = {
-            "creative_types": self.df['creative_type'].value_counts().to_dict(),
-            "platforms": self.df['platform'].value_counts().to_dict(),
-            "audience_types": self.df['audience_type'].value_counts().to_dict(),
-            "countries": self.df['country'].value_counts().to_dict()
-        }
-        
         return {
             "summary": self.loader.get_summary(),
             "time_series": self.loader.get_time_series_summary('roas', window=7),
-            "dimensions": dimensions
+            "dimensions": self._get_dimension_counts()
         }
     
     # Pipeline wrapper methods (for declarative execution)
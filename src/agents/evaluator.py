@@ -2,8 +2,9 @@
 Evaluator Agent - Validates insights and checks confidence levels
 """
 import logging
+import re
 import time
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
 from src.utils.structured_logger import StructuredLogger
 from src.utils.threshold_manager import ThresholdManager
@@ -11,6 +12,13 @@ from src.monitoring.alert_manager import AlertManager, AlertSeverity
 
 logger = logging.getLogger(__name__)
 
+# Integer percentages claimed in a hypothesis (e.g. "dropped 40%")
+_PERCENT_RE = re.compile(r'(\d+)%')
+
+# Every byte except ASCII digits; bytes.translate deleting these leaves only the
+# digits, so a non-empty result means the text is quantitative
+_NON_DIGIT_BYTES = bytes(b for b in range(256) if not 48 <= b <= 57)
+
 
 class EvaluatorAgent:
     """
@@ -57,9 +65,9 @@ class EvaluatorAgent:
         """
         # Calculate adaptive thresholds based on data quality
         if data_quality:
-            confidence_threshold = self._calculate_adaptive_confidence_threshold(data_quality)
-            quality_pass_threshold = self._get_quality_pass_threshold(data_quality)
-            min_evidence_count = self._get_min_evidence_count(data_quality)
+            confidence_threshold, quality_pass_threshold, min_evidence_count = (
+                self._get_adaptive_thresholds(data_quality)
+            )
             
             # Get base thresholds for logging comparison
             base_confidence = self.threshold_mgr.get_threshold("confidence", use_adaptive=False)
@@ -94,34 +102,55 @@ class EvaluatorAgent:
         try:
             logger.info(f"Evaluating {len(insights)} insights")
             
-            validated_insights = []
-            rejected_insights = []
+            # Index trend results once instead of rescanning them per insight, and
+            # only when some hypothesis actually makes a percentage claim
+            change_pcts = None
+            if any("%" in (insight.get("hypothesis") or "") for insight in insights):
+                change_pcts = self._index_change_pcts(analysis_results)
             
-            for insight in insights:
-                validation_result = self._validate_insight(insight, analysis_results, 
-                                                          confidence_threshold, min_evidence_count)
-                
-                # Log individual validation
-                self.logger.log_validation(
-                    validation_type=f"insight_{insight.get('category', 'unknown')}",
-                    passed=validation_result["is_valid"],
-                    details={
-                        "insight_id": insight.get("id"),
-                        "checks": validation_result.get("checks", {}),
-                        "rejection_reason": validation_result.get("rejection_reason")
-                    }
-                )
-                
+            results = [
+                (insight, self._validate_insight(insight, analysis_results,
+                                                 confidence_threshold, min_evidence_count,
+                                                 change_pcts=change_pcts))
+                for insight in insights
+            ]
+            
+            # Attach validation metadata / rejection reason, then partition
+            for insight, validation_result in results:
                 if validation_result["is_valid"]:
-                    # Enhance insight with validation metadata
                     insight["validation"] = validation_result
-                    validated_insights.append(insight)
                 else:
                     insight["rejection_reason"] = validation_result["rejection_reason"]
-                    rejected_insights.append(insight)
+            
+            validated_insights = [insight for insight, result in results if result["is_valid"]]
+            rejected_insights = [insight for insight, result in results if not result["is_valid"]]
+            
+            # Individual validations, written as one batch
+            validation_records = [
+                {
+                    "validation_type": f"insight_{insight.get('category', 'unknown')}",
+                    "passed": result["is_valid"],
+                    "details": {
+                        "insight_id": insight.get("id"),
+                        "checks": result.get("checks", {}),
+                        "skipped_checks": result.get("skipped_checks", []),
+                        "rejection_reason": result.get("rejection_reason")
+                    }
+                }
+                for insight, result in results
+            ]
+            
+            if validation_records:
+                self.logger.log_validation_batch(validation_records)
             
             # Calculate overall quality score
             quality_score = self._calculate_quality_score(validated_insights)
+            passed_threshold = quality_score >= quality_pass_threshold
+            adaptive_thresholds = {
+                "confidence": confidence_threshold,
+                "quality": quality_pass_threshold,
+                "min_evidence": min_evidence_count
+            }
             
             # Check if quality score is below threshold and raise alert
             if quality_score < self.quality_threshold and self.alert_manager:
@@ -139,7 +168,7 @@ class EvaluatorAgent:
                 context={
                     "validated_count": len(validated_insights),
                     "rejected_count": len(rejected_insights),
-                    "pass_threshold": quality_score >= quality_pass_threshold,
+                    "pass_threshold": passed_threshold,
                     "adaptive_threshold": quality_pass_threshold
                 }
             )
@@ -151,12 +180,8 @@ class EvaluatorAgent:
                 "overall_quality": quality_score,
                 "validated_insights": validated_insights,
                 "rejected_insights": rejected_insights,
-                "pass_threshold": quality_score >= quality_pass_threshold,
-                "adaptive_thresholds": {
-                    "confidence": confidence_threshold,
-                    "quality": quality_pass_threshold,
-                    "min_evidence": min_evidence_count
-                }
+                "pass_threshold": passed_threshold,
+                "adaptive_thresholds": adaptive_thresholds
             }
             
             logger.info(
@@ -172,12 +197,8 @@ class EvaluatorAgent:
                     "validated_count": len(validated_insights),
                     "rejected_count": len(rejected_insights),
                     "quality_score": quality_score,
-                    "passed_threshold": quality_score >= quality_pass_threshold,
-                    "adaptive_thresholds": {
-                        "confidence": confidence_threshold,
-                        "quality": quality_pass_threshold,
-                        "min_evidence": min_evidence_count
-                    }
+                    "passed_threshold": passed_threshold,
+                    "adaptive_thresholds": adaptive_thresholds
                 },
                 duration_seconds=duration
             )
@@ -197,6 +218,24 @@ class EvaluatorAgent:
             )
             raise
     
+    def _get_adaptive_thresholds(self, data_quality: Dict[str, Any]) -> Tuple[float, float, int]:
+        """
+        Confidence, quality pass and min evidence thresholds for a data quality level
+        
+        Not memoized here: ThresholdManager caches lookups and honours clear_cache().
+        
+        Args:
+            data_quality: Data quality assessment from planner
+            
+        Returns:
+            (confidence_threshold, quality_pass_threshold, min_evidence_count)
+        """
+        return (
+            self._calculate_adaptive_confidence_threshold(data_quality),
+            self._get_quality_pass_threshold(data_quality),
+            self._get_min_evidence_count(data_quality)
+        )
+    
     def _calculate_adaptive_confidence_threshold(self, data_quality: Dict[str, Any]) -> float:
         """
         Calculate adaptive confidence threshold using ThresholdManager
@@ -258,111 +297,150 @@ class EvaluatorAgent:
         insight: Dict[str, Any],
         analysis_results: List[Dict[str, Any]],
         confidence_threshold: float,
-        min_evidence_count: int
+        min_evidence_count: int,
+        change_pcts: Optional[np.ndarray] = None
     ) -> Dict[str, bool]:
         """Validate a single insight"""
         
-        checks = {
-            "has_hypothesis": bool(insight.get("hypothesis")),
-            "has_evidence": len(insight.get("evidence", [])) >= min_evidence_count,
-            "has_confidence": "confidence" in insight,
-            "confidence_in_range": 0.0 <= insight.get("confidence", 0) <= 1.0,
-            "meets_threshold": insight.get("confidence", 0) >= confidence_threshold,
-            "has_reasoning": bool(insight.get("reasoning")),
-            "has_recommendation": bool(insight.get("recommendation")),
-            "evidence_is_quantitative": self._check_quantitative_evidence(insight.get("evidence", []))
-        }
+        hypothesis = insight.get("hypothesis") or ""
+        evidence = insight.get("evidence", [])
+        confidence = insight.get("confidence", 0)
         
-        # Check if numbers in hypothesis are supported by data
-        checks["numerically_grounded"] = self._check_numerical_grounding(insight, analysis_results)
+        has_hypothesis = bool(hypothesis)
+        has_evidence = len(evidence) >= min_evidence_count
+        has_confidence = "confidence" in insight
+        confidence_in_range = 0.0 <= confidence <= 1.0
+        meets_threshold = confidence >= confidence_threshold
+        has_reasoning = bool(insight.get("reasoning"))
         
-        is_valid = all([
-            checks["has_hypothesis"],
-            checks["has_evidence"],
-            checks["has_confidence"],
-            checks["confidence_in_range"],
-            checks["meets_threshold"],
-            checks["has_reasoning"]
-        ])
+        is_valid = (
+            has_hypothesis
+            and has_evidence
+            and has_confidence
+            and confidence_in_range
+            and meets_threshold
+            and has_reasoning
+        )
         
         rejection_reason = None
         if not is_valid:
-            if not checks["meets_threshold"]:
-                rejection_reason = f"Confidence {insight.get('confidence', 0):.2f} below threshold {confidence_threshold:.2f}"
-            elif not checks["has_evidence"]:
+            if not meets_threshold:
+                rejection_reason = f"Confidence {confidence:.2f} below threshold {confidence_threshold:.2f}"
+            elif not has_evidence:
                 rejection_reason = f"Insufficient evidence (need >= {min_evidence_count})"
             else:
                 rejection_reason = "Failed basic validation checks"
         
-        return {
+        has_recommendation = bool(insight.get("recommendation"))
+        
+        # Cheap structural checks (logged for every insight)
+        checks = {
+            "has_hypothesis": has_hypothesis,
+            "has_evidence": has_evidence,
+            "has_confidence": has_confidence,
+            "confidence_in_range": confidence_in_range,
+            "meets_threshold": meets_threshold,
+            "has_reasoning": has_reasoning,
+            "has_recommendation": has_recommendation
+        }
+        
+        result = {
             "is_valid": is_valid,
             "checks": checks,
-            "rejection_reason": rejection_reason,
-            "quality_factors": {
-                "completeness": sum(checks.values()) / len(checks),
-                "confidence": insight.get("confidence", 0),
-                "evidence_strength": len(insight.get("evidence", [])) / 5.0  # normalize to 0-1
-            }
+            "rejection_reason": rejection_reason
         }
+        
+        # Content checks only feed the quality score of accepted insights, so
+        # rejected ones skip them (and the grounding regex/scan)
+        if is_valid:
+            evidence_is_quantitative = self._check_quantitative_evidence(evidence)
+            # Check if numbers in hypothesis are supported by data (trivially true
+            # without a percentage claim, so skip the call entirely)
+            numerically_grounded = "%" not in hypothesis or self._check_numerical_grounding(
+                insight, analysis_results, change_pcts=change_pcts
+            )
+            checks["evidence_is_quantitative"] = evidence_is_quantitative
+            checks["numerically_grounded"] = numerically_grounded
+            
+            # The six validity checks all passed; only the other three can vary
+            passed_checks = 6 + has_recommendation + evidence_is_quantitative + numerically_grounded
+            
+            # Only accepted insights are scored (see _calculate_quality_score)
+            result["quality_factors"] = {
+                "completeness": passed_checks / len(checks),
+                "confidence": confidence,
+                "evidence_strength": len(evidence) / 5.0  # normalize to 0-1
+            }
+        else:
+            result["skipped_checks"] = ["evidence_is_quantitative", "numerically_grounded"]
+        return result
     
     def _check_quantitative_evidence(self, evidence: List[str]) -> bool:
         """Check if evidence includes specific numbers"""
-        quantitative_count = 0
-        for item in evidence:
-            # Look for numbers, percentages, or specific metrics
-            if any(char.isdigit() for char in item):
-                quantitative_count += 1
-        
-        return quantitative_count >= 1
+        # Look for numbers, percentages, or specific metrics; stops at the first hit
+        return any(
+            item.encode("ascii", "ignore").translate(None, _NON_DIGIT_BYTES)
+            for item in evidence
+        )
     
     def _check_numerical_grounding(
         self,
         insight: Dict[str, Any],
-        analysis_results: List[Dict[str, Any]]
+        analysis_results: List[Dict[str, Any]],
+        change_pcts: Optional[np.ndarray] = None
     ) -> bool:
         """
         Verify that numerical claims in hypothesis are supported by data
         This is a simplified check - in production you'd do more rigorous validation
+        
+        change_pcts: precomputed _index_change_pcts(analysis_results), if available
         """
         hypothesis = insight.get("hypothesis", "")
         
-        # Extract percentages mentioned in hypothesis
-        import re
-        percentages = re.findall(r'(\d+)%', hypothesis)
+        # Cheap substring test first: most hypotheses make no percentage claim
+        if "%" not in hypothesis:
+            return True
         
-        if not percentages:
+        # Only the first percentage claimed in the hypothesis is checked
+        match = _PERCENT_RE.search(hypothesis)
+        
+        if not match:
             return True  # No specific claims to validate
         
-        # Check if similar numbers appear in analysis results
-        for result in analysis_results:
-            if 'change_pct' in result:
-                claimed_pct = float(percentages[0])
-                actual_pct = abs(result['change_pct'])
-                # Allow 10% tolerance
-                if abs(claimed_pct - actual_pct) / max(actual_pct, 1) < 0.1:
-                    return True
+        if change_pcts is None:
+            change_pcts = self._index_change_pcts(analysis_results)
         
-        return False  # Numbers not found in data
+        # Check if similar numbers appear in analysis results (10% tolerance)
+        claimed_pct = float(match.group(1))
+        return bool(np.any(
+            np.abs(claimed_pct - change_pcts) / np.maximum(change_pcts, 1) < 0.1
+        ))
+    
+    @staticmethod
+    def _index_change_pcts(analysis_results: List[Dict[str, Any]]) -> np.ndarray:
+        """Absolute change_pct of every trend result, as a float array"""
+        return np.fromiter(
+            (abs(r['change_pct']) for r in analysis_results if 'change_pct' in r),
+            dtype=np.float64
+        )
     
     def _calculate_quality_score(self, validated_insights: List[Dict[str, Any]]) -> float:
         """Calculate overall quality score for the insight set"""
         if not validated_insights:
             return 0.0
         
-        scores = []
+        total = 0.0
         for insight in validated_insights:
-            validation = insight.get("validation", {})
-            quality = validation.get("quality_factors", {})
+            quality = insight.get("validation", {}).get("quality_factors", {})
             
             # Weighted average of quality factors
-            score = (
+            total += (
                 quality.get("completeness", 0) * 0.3 +
                 quality.get("confidence", 0) * 0.5 +
                 quality.get("evidence_strength", 0) * 0.2
             )
-            scores.append(score)
         
-        return float(np.mean(scores))
+        return total / len(validated_insights)
     
     def requires_retry(self, evaluation_report: Dict[str, Any]) -> bool:
         """Determine if insight generation should be retried"""
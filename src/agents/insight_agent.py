@@ -1,17 +1,98 @@
 """
 Insight Agent - Generates hypotheses explaining performance patterns
 """
-import json
 import logging
 import time
-from typing import Dict, List, Any, Optional
-from src.utils.llm import LLMClient
+from typing import Dict, List, Any, Final, Iterator, Optional
+import orjson
+from src.utils.llm import JSONArrayStreamParser, LLMClient, parse_json_response
+from src.utils.response_cache import build_response_cache, data_end_date
 from src.utils.structured_logger import StructuredLogger
 from src.utils.exceptions import JSONParseError
 from src.monitoring.alert_manager import AlertManager, AlertSeverity
 
 logger = logging.getLogger(__name__)
 
+# System prompt for insight generation; constant so every call shares the same leading bytes
+_SYSTEM_PROMPT: Final[str] = """You are a Senior Marketing Analytics Expert. Your job is to analyze Facebook Ads data and generate actionable insights.
+
+**Your Process:**
+1. **THINK**: Review the data patterns and numbers
+2. **ANALYZE**: Identify what's driving performance changes
+3. **CONCLUDE**: Form clear, testable hypotheses
+
+**Output Format (strict JSON):**
+{
+  "insights": [
+    {
+      "id": "insight_1",
+      "category": "roas_decline",
+      "hypothesis": "ROAS declined 23% in the last 7 days due to audience fatigue in Retargeting campaigns",
+      "evidence": [
+        "Retargeting campaigns show 18% CTR drop",
+        "Impressions increased 40% while clicks stayed flat",
+        "Best performing period was days 1-10, now seeing diminishing returns"
+      ],
+      "confidence": 0.75,
+      "reasoning": "The correlation between increased frequency and declining CTR suggests audience saturation. Retargeting audiences are smaller and exhaust faster.",
+      "recommendation": "Pause underperforming retargeting campaigns and refresh creative OR expand to LAL audiences"
+    }
+  ]
+}
+
+**Categories:**
+- roas_decline / roas_improvement
+- ctr_issues
+- creative_fatigue
+- audience_saturation
+- platform_performance
+- budget_allocation
+
+**Rules:**
+- Base hypotheses ONLY on provided data
+- Include specific numbers as evidence
+- Confidence must be 0.0 to 1.0 (be honest about uncertainty)
+- Each insight needs clear reasoning
+- Recommendations must be actionable
+- Output ONLY valid JSON"""
+
+# Compact one-line JSON per analysis result (indentation only costs prompt tokens);
+# numpy scalars and non-string keys from pandas results serialize as-is
+_RESULT_DUMPS_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Static parts of the insight prompt; only the data context and results are
+# rendered per call
+_PROMPT_HEAD = "Based on the following analysis results, generate 2-4 key insights explaining what's happening with this Facebook Ads account.\n"
+
+_QUERY_CONTEXT_TEMPLATE = "\n**USER QUESTION:** {user_query}\n**IMPORTANT:** Your insights MUST directly answer this question. Focus your analysis on what the user asked.\n"
+
+# Dataset and time-series context, filled per call with format_map
+_DATA_CONTEXT_TEMPLATE = """
+**Data Context:**
+- Date Range: {start} to {end}
+- Total Spend: ${total_spend:,.2f}
+- Total Revenue: ${total_revenue:,.2f}
+- Average ROAS: {avg_roas:.2f}
+- Average CTR: {avg_ctr:.2%}
+
+**Time Series Context:**
+- Recent ROAS: {recent_avg:.2f}
+- Previous ROAS: {previous_avg:.2f}
+- Change: {change_pct:.1f}%
+
+**Analysis Results:**
+"""
+
+_PROMPT_TAIL = """
+
+Generate insights that:
+1. Explain WHY performance changed
+2. Identify root causes (creative fatigue, audience issues, etc.)
+3. Include specific evidence from the data
+4. Provide actionable recommendations
+
+Output ONLY valid JSON with 2-4 insights. Think step by step."""
+
 
 class InsightAgent:
     """
@@ -33,6 +114,9 @@ class InsightAgent:
         # Get confidence threshold from config
         self.confidence_threshold = self.config.get('monitoring', {}).get('alerts', {}).get('confidence_threshold', 0.5)
         
+        # Parsed insights for identical inputs (None unless enabled with temperature 0)
+        self.response_cache = build_response_cache(self.config)
+        
     def generate_insights(
         self,
         analysis_results: List[Dict[str, Any]],
@@ -50,165 +134,225 @@ class InsightAgent:
         Returns:
             List of insights with hypotheses and evidence
         """
-        # Log agent start
-        self.logger.log_agent_start(
-            "insight_agent",
-            input_data={
-                "analysis_result_count": len(analysis_results),
-                "data_context_keys": list(data_context.keys())
-            }
-        )
-        
-        start_time = time.time()
+        start_time = self._log_start(analysis_results, data_context)
         
         try:
             logger.info("Generating insights from analysis results")
             
+            if self.response_cache is not None:
+                data_version = data_end_date(data_context.get("summary"))
+                cached = self.response_cache.lookup(
+                    user_query, (analysis_results, data_context), version=data_version
+                )
+                if cached is not None:
+                    logger.info(f"Response cache hit: reusing {len(cached)} insights")
+                    self.logger.log_agent_complete(
+                        "insight_agent",
+                        output_data={
+                            "insight_count": len(cached),
+                            "categories": [i.get("category") for i in cached],
+                            "cache_hit": True
+                        },
+                        duration_seconds=time.time() - start_time
+                    )
+                    return cached
+            
             system_prompt = self._get_system_prompt()
             user_prompt = self._build_prompt(analysis_results, data_context, user_query)
             
             # Log LLM call
             llm_start = time.time()
-            response = self.llm.generate(user_prompt, system_prompt)
-            llm_duration = time.time() - llm_start
-            
-            self.logger.log_llm_call(
-                agent_name="insight_agent",
-                prompt=user_prompt,
-                system_prompt=system_prompt,
-                response=response,
-                model=self.llm.model,
-                duration_seconds=llm_duration
-            )
+            response = self.llm.generate(user_prompt, system_prompt, cache_query=user_query)
+            self._log_llm_call(user_prompt, system_prompt, response, time.time() - llm_start)
             
             try:
-                # Extract JSON from markdown code blocks if present
-                clean_response = response
-                if "```json" in response:
-                    clean_response = response.split("```json")[1].split("```")[0].strip()
-                elif "```" in response:
-                    clean_response = response.split("```")[1].split("```")[0].strip()
-                
-                insights = json.loads(clean_response)
+                # JSON may be fenced or wrapped in prose
+                insights = parse_json_response(response)
                 insight_list = insights.get("insights", [])
                 
-                logger.info(f"Generated {len(insight_list)} insights")
-                
-                # Check for low confidence insights and raise alerts
-                if self.alert_manager:
-                    self._check_insight_confidence(insight_list)
-                
-                # Log metrics for confidence scores
-                if insight_list:
-                    avg_confidence = sum(i.get("confidence", 0) for i in insight_list) / len(insight_list)
-                    self.logger.log_metric(
-                        "insight_confidence",
-                        avg_confidence,
-                        context={
-                            "insight_count": len(insight_list),
-                            "min_confidence": min(i.get("confidence", 0) for i in insight_list),
-                            "max_confidence": max(i.get("confidence", 0) for i in insight_list)
-                        }
-                    )
-                
-                # Log completion
-                duration = time.time() - start_time
-                self.logger.log_agent_complete(
-                    "insight_agent",
-                    output_data={
-                        "insight_count": len(insight_list),
-                        "categories": [i.get("category") for i in insight_list]
-                    },
-                    duration_seconds=duration
-                )
-                
-                return insight_list
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse insights response: {e}")
-                
-                # Log JSON parse error
-                self.logger.log_agent_error(
-                    "insight_agent",
-                    error=JSONParseError(
-                        f"Failed to parse JSON from LLM response: {e}",
-                        raw_response=response,
-                        agent_name="insight_agent"
-                    ),
-                    context={"raw_response": response[:500]}
-                )
-                
-                # Fallback
-                fallback = self._get_fallback_insights(analysis_results)
-                
-                duration = time.time() - start_time
-                self.logger.log_agent_complete(
-                    "insight_agent",
-                    output_data={
-                        "insight_count": len(fallback),
-                        "fallback_used": True
-                    },
-                    duration_seconds=duration
+            except orjson.JSONDecodeError as e:
+                return self._fallback_insights(e, response, analysis_results, start_time)
+            
+            logger.info(f"Generated {len(insight_list)} insights")
+            
+            if self.response_cache is not None:
+                self.response_cache.update(
+                    user_query, (analysis_results, data_context), insight_list, version=data_version
                 )
+            
+            self._complete_insights(insight_list, start_time)
+            return insight_list
                 
-                return fallback
-                
         except Exception as e:
-            # Log unexpected error
-            duration = time.time() - start_time
-            self.logger.log_agent_error(
-                "insight_agent",
-                error=e,
+            self._log_error(e, analysis_results, start_time)
+            raise
+    
+    def stream_insights(
+        self,
+        analysis_results: List[Dict[str, Any]],
+        data_context: Dict[str, Any],
+        user_query: str = None,
+        max_insights: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of generate_insights()
+        
+        Consumes LLMClient.stream() and yields each insight as soon as its object
+        closes, instead of waiting for the whole response. Stops reading the stream
+        once max_insights have been yielded. Falls back to the regular parsing/
+        fallback path if nothing could be extracted incrementally. Not cached.
+        
+        Yields:
+            Insights in the order the LLM produces them
+        """
+        start_time = self._log_start(analysis_results, data_context)
+        
+        try:
+            logger.info("Generating insights from analysis results (streaming)")
+            
+            system_prompt = self._get_system_prompt()
+            user_prompt = self._build_prompt(analysis_results, data_context, user_query)
+            
+            parser = JSONArrayStreamParser("insights")
+            insight_list = []
+            first_insight_seconds = None
+            llm_start = time.time()
+            stream = self.llm.stream(user_prompt, system_prompt)
+            for delta in stream:
+                completed = parser.feed(delta)
+                if max_insights is not None:
+                    completed = completed[:max_insights - len(insight_list)]
+                for insight in completed:
+                    if first_insight_seconds is None:
+                        first_insight_seconds = round(time.time() - llm_start, 3)
+                    insight_list.append(insight)
+                    yield insight
+                if max_insights is not None and len(insight_list) >= max_insights:
+                    stream.close()  # stop reading; closes the HTTP response
+                    break
+            self._log_llm_call(user_prompt, system_prompt, parser.buffer, time.time() - llm_start)
+            
+        except Exception as e:
+            self._log_error(e, analysis_results, start_time)
+            raise
+        
+        if insight_list:
+            logger.info(f"Generated {len(insight_list)} insights")
+            self._complete_insights(insight_list, start_time, time_to_first_insight_seconds=first_insight_seconds)
+            return
+        
+        try:
+            insight_list = parse_json_response(parser.buffer).get("insights", [])
+        except orjson.JSONDecodeError as e:
+            yield from self._fallback_insights(e, parser.buffer, analysis_results, start_time)
+            return
+        
+        logger.info(f"Generated {len(insight_list)} insights")
+        self._complete_insights(insight_list, start_time)
+        yield from insight_list
+    
+    def _log_start(self, analysis_results: List[Dict[str, Any]], data_context: Dict[str, Any]) -> float:
+        """Log agent start and return the start timestamp"""
+        self.logger.log_agent_start(
+            "insight_agent",
+            input_data={
+                "analysis_result_count": len(analysis_results),
+                "data_context_keys": list(data_context.keys())
+            }
+        )
+        return time.time()
+    
+    def _log_llm_call(self, user_prompt: str, system_prompt: str, response: str, duration: float) -> None:
+        """Log an LLM call made by the insight agent"""
+        self.logger.log_llm_call(
+            agent_name="insight_agent",
+            prompt=user_prompt,
+            system_prompt=system_prompt,
+            response=response,
+            model=self.llm.model,
+            duration_seconds=duration
+        )
+    
+    def _complete_insights(self, insight_list: List[Dict[str, Any]], start_time: float, **output_extra) -> None:
+        """Raise low-confidence alerts, log confidence metrics and log completion"""
+        # Check for low confidence insights and raise alerts
+        if self.alert_manager:
+            self._check_insight_confidence(insight_list)
+        
+        # Log metrics for confidence scores
+        if insight_list:
+            confidences = [i.get("confidence", 0) for i in insight_list]
+            self.logger.log_metric(
+                "insight_confidence",
+                sum(confidences) / len(confidences),
                 context={
-                    "analysis_result_count": len(analysis_results),
-                    "duration_before_error": duration
+                    "insight_count": len(confidences),
+                    "min_confidence": min(confidences),
+                    "max_confidence": max(confidences)
                 }
             )
-            raise
+        
+        # Log completion
+        duration = time.time() - start_time
+        self.logger.log_agent_complete(
+            "insight_agent",
+            output_data={
+                "insight_count": len(insight_list),
+                "categories": [i.get("category") for i in insight_list],
+                **output_extra
+            },
+            duration_seconds=duration
+        )
+    
+    def _fallback_insights(
+        self,
+        error: Exception,
+        response: str,
+        analysis_results: List[Dict[str, Any]],
+        start_time: float
+    ) -> List[Dict[str, Any]]:
+        """Log an unparseable response and return fallback insights"""
+        logger.error(f"Failed to parse insights response: {error}")
+        
+        # Log JSON parse error
+        self.logger.log_agent_error(
+            "insight_agent",
+            error=JSONParseError(
+                f"Failed to parse JSON from LLM response: {error}",
+                raw_response=response,
+                agent_name="insight_agent"
+            ),
+            context={"raw_response": response[:500]}
+        )
+        
+        fallback = self._get_fallback_insights(analysis_results)
+        
+        duration = time.time() - start_time
+        self.logger.log_agent_complete(
+            "insight_agent",
+            output_data={
+                "insight_count": len(fallback),
+                "fallback_used": True
+            },
+            duration_seconds=duration
+        )
+        
+        return fallback
+    
+    def _log_error(self, error: Exception, analysis_results: List[Dict[str, Any]], start_time: float) -> None:
+        """Log an unexpected insight agent error"""
+        self.logger.log_agent_error(
+            "insight_agent",
+            error=error,
+            context={
+                "analysis_result_count": len(analysis_results),
+                "duration_before_error": time.time() - start_time
+            }
+        )
     
     def _get_system_prompt(self) -> str:
         """System prompt for insight generation"""
-        return """You are a Senior Marketing Analytics Expert. Your job is to analyze Facebook Ads data and generate actionable insights.
-
-**Your Process:**
-1. **THINK**: Review the data patterns and numbers
-2. **ANALYZE**: Identify what's driving performance changes
-3. **CONCLUDE**: Form clear, testable hypotheses
-
-**Output Format (strict JSON):**
-{
-  "insights": [
-    {
-      "id": "insight_1",
-      "category": "roas_decline",
-      "hypothesis": "ROAS declined 23% in the last 7 days due to audience fatigue in Retargeting campaigns",
-      "evidence": [
-        "Retargeting campaigns show 18% CTR drop",
-        "Impressions increased 40% while clicks stayed flat",
-        "Best performing period was days 1-10, now seeing diminishing returns"
-      ],
-      "confidence": 0.75,
-      "reasoning": "The correlation between increased frequency and declining CTR suggests audience saturation. Retargeting audiences are smaller and exhaust faster.",
-      "recommendation": "Pause underperforming retargeting campaigns and refresh creative OR expand to LAL audiences"
-    }
-  ]
-}
-
-**Categories:**
-- roas_decline / roas_improvement
-- ctr_issues
-- creative_fatigue
-- audience_saturation
-- platform_performance
-- budget_allocation
-
-**Rules:**
-- Base hypotheses ONLY on provided data
-- Include specific numbers as evidence
-- Confidence must be 0.0 to 1.0 (be honest about uncertainty)
-- Each insight needs clear reasoning
-- Recommendations must be actionable
-- Output ONLY valid JSON"""
+        return _SYSTEM_PROMPT
 
     def _build_prompt(
         self,
@@ -219,55 +363,52 @@ class InsightAgent:
         """Build prompt with analysis results, context, and user query"""
         
         # Summarize analysis results
-        results_summary = []
-        for i, result in enumerate(analysis_results, 1):
-            results_summary.append(f"Analysis {i}: {json.dumps(result, indent=2)}")
+        results_summary = [
+            f"Analysis {i}: {orjson.dumps(result, option=_RESULT_DUMPS_OPTIONS).decode()}"
+            for i, result in enumerate(analysis_results, 1)
+        ]
         
-        query_context = f"\n**USER QUESTION:** {user_query}\n**IMPORTANT:** Your insights MUST directly answer this question. Focus your analysis on what the user asked.\n" if user_query else ""
+        summary = data_context['summary']
+        date_range = summary['date_range']
+        metrics = summary['metrics']
+        time_series = data_context['time_series']
         
-        return f"""Based on the following analysis results, generate 2-4 key insights explaining what's happening with this Facebook Ads account.
-{query_context}
-**Data Context:**
-- Date Range: {data_context['summary']['date_range']['start']} to {data_context['summary']['date_range']['end']}
-- Total Spend: ${data_context['summary']['metrics']['total_spend']:,.2f}
-- Total Revenue: ${data_context['summary']['metrics']['total_revenue']:,.2f}
-- Average ROAS: {data_context['summary']['metrics']['avg_roas']:.2f}
-- Average CTR: {data_context['summary']['metrics']['avg_ctr']:.2%}
-
-**Time Series Context:**
-- Recent ROAS: {data_context['time_series']['recent_avg']:.2f}
-- Previous ROAS: {data_context['time_series']['previous_avg']:.2f}
-- Change: {data_context['time_series']['change_pct']:.1f}%
-
-**Analysis Results:**
-{chr(10).join(results_summary)}
-
-Generate insights that:
-1. Explain WHY performance changed
-2. Identify root causes (creative fatigue, audience issues, etc.)
-3. Include specific evidence from the data
-4. Provide actionable recommendations
-
-Output ONLY valid JSON with 2-4 insights. Think step by step."""
+        return "".join((
+            _PROMPT_HEAD,
+            _QUERY_CONTEXT_TEMPLATE.format(user_query=user_query) if user_query else "",
+            _DATA_CONTEXT_TEMPLATE.format_map({
+                'start': date_range['start'],
+                'end': date_range['end'],
+                'total_spend': metrics['total_spend'],
+                'total_revenue': metrics['total_revenue'],
+                'avg_roas': metrics['avg_roas'],
+                'avg_ctr': metrics['avg_ctr'],
+                'recent_avg': time_series['recent_avg'],
+                'previous_avg': time_series['previous_avg'],
+                'change_pct': time_series['change_pct']
+            }),
+            "\n".join(results_summary),
+            _PROMPT_TAIL
+        ))
 
     def _get_fallback_insights(self, analysis_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Generate basic insights if LLM fails"""
         logger.warning("Using fallback insights")
         
-        insights = []
-        
         # Try to extract at least one insight from results
-        for result in analysis_results:
-            if 'change_pct' in result:
-                insights.append({
-                    "id": "fallback_1",
-                    "category": "metric_change",
-                    "hypothesis": f"Metric {result.get('metric', 'unknown')} changed by {result.get('change_pct', 0):.1f}%",
-                    "evidence": [f"Recent average: {result.get('recent_avg', 0):.2f}"],
-                    "confidence": 0.5,
-                    "reasoning": "Basic statistical observation",
-                    "recommendation": "Investigate further to understand root cause"
-                })
+        insights = [
+            {
+                "id": "fallback_1",
+                "category": "metric_change",
+                "hypothesis": f"Metric {result.get('metric', 'unknown')} changed by {result['change_pct']:.1f}%",
+                "evidence": [f"Recent average: {result.get('recent_avg', 0):.2f}"],
+                "confidence": 0.5,
+                "reasoning": "Basic statistical observation",
+                "recommendation": "Investigate further to understand root cause"
+            }
+            for result in analysis_results
+            if 'change_pct' in result
+        ]
         
         if not insights:
             insights.append({
@@ -291,9 +432,10 @@ Output ONLY valid JSON with 2-4 insights. Think step by step."""
         """
         for insight in insights:
             confidence = insight.get('confidence', 0)
-            insight_id = insight.get('insight_id', insight.get('id', 'unknown'))
             
             if confidence < self.confidence_threshold:
+                insight_id = insight.get('insight_id', insight.get('id', 'unknown'))
+                
                 # Determine reason for low confidence
                 evidence_count = len(insight.get('evidence', []))
                 if evidence_count < 2:
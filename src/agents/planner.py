@@ -1,18 +1,110 @@
 """
 Planner Agent - Decomposes user query into actionable subtasks
 """
-import json
+import asyncio
+import copy
 import logging
 import time
-import numpy as np
-from typing import Dict, List, Any
-from src.utils.llm import LLMClient
+import orjson
+from contextlib import nullcontext
+from typing import ContextManager, Dict, Iterator, List, Any, Final, Optional, Tuple
+from src.utils.llm import JSONArrayStreamParser, LLMClient, parse_json_response
+from src.utils.response_cache import build_response_cache, data_end_date
 from src.utils.structured_logger import StructuredLogger
 from src.utils.exceptions import JSONParseError
 from src.utils.threshold_manager import ThresholdManager
 
 logger = logging.getLogger(__name__)
 
+# System prompt defining planner role and output format
+_SYSTEM_PROMPT: Final[str] = """You are a Marketing Analytics Planner Agent. Your job is to decompose user queries into structured subtasks.
+
+**Your responsibilities:**
+1. Understand what the user wants to know about Facebook ad performance
+2. Break down the query into specific, actionable subtasks
+3. Return a valid JSON structure
+
+**Output format (strict JSON):**
+{
+  "subtasks": [
+    {
+      "task_id": "1",
+      "task_type": "analyze_metric_trend",
+      "description": "Analyze ROAS trend over time",
+      "parameters": {
+        "metric": "roas",
+        "timeframe": "last_7_days"
+      }
+    },
+    {
+      "task_id": "2",
+      "task_type": "identify_underperformers",
+      "description": "Find campaigns with low CTR",
+      "parameters": {
+        "metric": "ctr",
+        "threshold": 0.01
+      }
+    }
+  ]
+}
+
+**Available task types:**
+- analyze_metric_trend: Track how a metric changed over time
+- identify_underperformers: Find low-performing campaigns/creatives
+- segment_analysis: Compare performance across dimensions (platform, country, creative_type)
+- creative_analysis: Analyze creative message effectiveness
+
+**Available metrics (ONLY use these):**
+- Base metrics: spend, impressions, clicks, purchases, revenue
+- Calculated metrics: ctr, roas, cpc, cpm, cvr
+- Aliases: sales (use 'revenue'), conversions (use 'purchases'), cost (use 'spend')
+
+**CRITICAL: When user asks about "sales", use metric="revenue". When they ask about "conversions", use metric="purchases".**
+
+**Rules:**
+- Always output valid JSON
+- Include 2-4 subtasks
+- Be specific in descriptions
+- Use ONLY metrics from the list above
+- Set reasonable parameters based on the data summary"""
+
+# Queries per batched LLM call; plan quality drops as more queries share one response
+_MAX_PLAN_BATCH = 8
+
+# Concurrent LLM calls in aplan_many(); keeps bursts within provider rate limits
+_MAX_CONCURRENT_PLANS = 8
+
+# Dataset context block of the planner prompt, filled per data summary by _build_dataset_context()
+_DATASET_CONTEXT_TEMPLATE: Final[str] = """Dataset Context:
+- Date Range: {start} to {end} ({days} days)
+- Total Campaigns: {campaign_count}
+- Total Spend: ${total_spend:,.2f}
+- Average ROAS: {avg_roas:.2f}
+- Average CTR: {avg_ctr:.2%}
+
+Data Quality Assessment:
+- Variance Level: {quality_level}
+- Sample Size: {sample_size} campaigns
+
+Adaptive Thresholds (adjusted for data characteristics):
+- CTR Threshold: {ctr_threshold:.4f}
+- CVR Threshold: {cvr_threshold:.4f}
+- ROAS Threshold: {roas_threshold:.2f}
+
+Available Dimensions:
+- Creative Types: {creative_types}
+- Platforms: {platforms}
+- Countries: {countries}"""
+
+# Per-query instruction closing a single-query prompt
+_PLAN_INSTRUCTIONS = "Generate a structured plan with 2-4 subtasks to answer this query. Use the adaptive thresholds above when setting parameters for underperformer identification. Output ONLY valid JSON, no other text."
+
+# Output instructions for batched prompts (one LLM call covering several queries)
+_BATCH_OUTPUT_INSTRUCTIONS = """The queries above are independent. Plan each one on its own with 2-4 subtasks, using only the dataset context and adaptive thresholds listed with that query.
+
+Output ONLY valid JSON in this shape, with one entry per query:
+{"results": [{"query_id": "<query id>", "subtasks": [...same subtask objects as the single-query format...]}]}"""
+
 
 class PlannerAgent:
     """
@@ -33,6 +125,12 @@ class PlannerAgent:
         self.high_variance_cv = adaptive_config.get("high_variance_cv", 0.5)
         self.low_variance_cv = adaptive_config.get("low_variance_cv", 0.2)
         
+        # Adapted thresholds per data quality string (the manager's config is fixed after init)
+        self._adapted_thresholds: Dict[str, Dict[str, float]] = {}
+        
+        # Parsed subtasks for identical inputs (None unless enabled with temperature 0)
+        self.response_cache = build_response_cache(self.config)
+        
     def plan(self, user_query: str, data_summary: Dict[str, Any], raw_data: Any = None) -> Dict[str, Any]:
         """
         Create execution plan from user query with adaptive thresholds
@@ -45,7 +143,151 @@ class PlannerAgent:
         Returns:
             Dict with 'plan' (list of subtasks) and 'data_quality' (assessment)
         """
-        # Log agent start
+        start_time = self._log_start(user_query, data_summary)
+        
+        try:
+            logger.info(f"Planning for query: {user_query}")
+            
+            data_quality, adaptive_thresholds, cached = self._prepare_plan(user_query, data_summary, raw_data)
+            if cached is not None:
+                return self._complete_plan(cached, data_quality, adaptive_thresholds, start_time, cache_hit=True)
+            
+            system_prompt = self._get_system_prompt()
+            user_prompt = self._build_prompt(user_query, data_summary, adaptive_thresholds, data_quality)
+            
+            # Log LLM call
+            llm_start = time.time()
+            response = self.llm.generate(user_prompt, system_prompt, cache_query=user_query)
+            with self._log_batch():
+                self._log_llm_call(user_prompt, system_prompt, response, time.time() - llm_start)
+                return self._parse_plan(response, user_query, data_summary, data_quality, adaptive_thresholds, start_time)
+                
+        except Exception as e:
+            self._log_error(e, user_query, start_time)
+            raise
+    
+    async def aplan(self, user_query: str, data_summary: Dict[str, Any], raw_data: Any = None) -> Dict[str, Any]:
+        """
+        Async variant of plan() for use with asyncio.gather
+        
+        Identical prompts, caching, JSON parsing and fallback; only the LLM call is
+        awaited, so plans for independent queries overlap their network latency.
+        """
+        start_time = self._log_start(user_query, data_summary)
+        
+        try:
+            logger.info(f"Planning for query (async): {user_query}")
+            
+            data_quality, adaptive_thresholds, cached = self._prepare_plan(user_query, data_summary, raw_data)
+            if cached is not None:
+                return self._complete_plan(cached, data_quality, adaptive_thresholds, start_time, cache_hit=True)
+            
+            system_prompt = self._get_system_prompt()
+            user_prompt = self._build_prompt(user_query, data_summary, adaptive_thresholds, data_quality)
+            
+            # Log LLM call
+            llm_start = time.time()
+            response = await self.llm.agenerate(user_prompt, system_prompt, cache_query=user_query)
+            with self._log_batch():
+                self._log_llm_call(user_prompt, system_prompt, response, time.time() - llm_start)
+                return self._parse_plan(response, user_query, data_summary, data_quality, adaptive_thresholds, start_time)
+                
+        except Exception as e:
+            self._log_error(e, user_query, start_time)
+            raise
+    
+    async def aplan_many(
+        self,
+        queries: List[Tuple[str, Dict[str, Any]]],
+        raw_data: Any = None,
+        max_concurrency: int = _MAX_CONCURRENT_PLANS
+    ) -> List[Dict[str, Any]]:
+        """
+        Plan several independent queries concurrently, one aplan() call each
+        
+        Unlike plan_many(), every query keeps its own prompt; wall time is roughly
+        the slowest call rather than the sum. Cached queries return without
+        waiting on the LLM.
+        
+        Args:
+            queries: (user_query, data_summary) pairs
+            raw_data: Optional pandas DataFrame for data quality assessment
+            max_concurrency: Maximum LLM calls in flight
+            
+        Returns:
+            List of dicts as returned by plan(), one per query (same order)
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def plan_one(user_query: str, data_summary: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.aplan(user_query, data_summary, raw_data)
+        
+        return list(await asyncio.gather(*(plan_one(query, summary) for query, summary in queries)))
+    
+    def stream_plan(
+        self,
+        user_query: str,
+        data_summary: Dict[str, Any],
+        raw_data: Any = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of plan()
+        
+        Consumes LLMClient.stream() and yields each subtask as soon as its object
+        closes, so downstream work can start on the first subtask while the rest
+        are generated. Cache hits are yielded directly; if nothing could be
+        extracted incrementally, the regular parsing/fallback path is used. The
+        generator returns the plan() result (available via ``yield from``).
+        
+        Yields:
+            Subtasks in the order the LLM produces them
+        """
+        start_time = self._log_start(user_query, data_summary)
+        
+        try:
+            logger.info(f"Planning for query (streaming): {user_query}")
+            
+            data_quality, adaptive_thresholds, cached = self._prepare_plan(user_query, data_summary, raw_data)
+            if cached is not None:
+                result = self._complete_plan(cached, data_quality, adaptive_thresholds, start_time, cache_hit=True)
+                yield from cached
+                return result
+            
+            system_prompt = self._get_system_prompt()
+            user_prompt = self._build_prompt(user_query, data_summary, adaptive_thresholds, data_quality)
+            
+            parser = JSONArrayStreamParser("subtasks")
+            subtasks = []
+            first_subtask_seconds = None
+            llm_start = time.time()
+            for delta in self.llm.stream(user_prompt, system_prompt):
+                for subtask in parser.feed(delta):
+                    if first_subtask_seconds is None:
+                        first_subtask_seconds = round(time.time() - llm_start, 3)
+                    # Keep an unmodified copy for the cache; the caller may edit what it receives
+                    subtasks.append(copy.deepcopy(subtask))
+                    yield subtask
+            self._log_llm_call(user_prompt, system_prompt, parser.buffer, time.time() - llm_start)
+            
+        except Exception as e:
+            self._log_error(e, user_query, start_time)
+            raise
+        
+        if subtasks:
+            logger.info(f"Generated plan with {len(subtasks)} subtasks")
+            self._store_plan(user_query, data_summary, data_quality, adaptive_thresholds, subtasks)
+            return self._complete_plan(
+                subtasks, data_quality, adaptive_thresholds, start_time,
+                time_to_first_subtask_seconds=first_subtask_seconds
+            )
+        
+        result = self._parse_plan(parser.buffer, user_query, data_summary, data_quality, adaptive_thresholds, start_time)
+        yield from result['plan']
+        return result
+    
+    def _log_start(self, user_query: str, data_summary: Dict[str, Any]) -> float:
+        """Log agent start and return the start timestamp"""
         self.logger.log_agent_start(
             "planner",
             input_data={
@@ -53,103 +295,262 @@ class PlannerAgent:
                 "data_summary": data_summary
             }
         )
+        return time.time()
+    
+    def _prepare_plan(
+        self,
+        user_query: str,
+        data_summary: Dict[str, Any],
+        raw_data: Any
+    ) -> Tuple[Dict[str, Any], Dict[str, float], Optional[List[Dict[str, Any]]]]:
+        """
+        Assess data quality, adapt thresholds and look up the response cache
         
-        start_time = time.time()
+        Returns:
+            (data_quality, adaptive_thresholds, cached subtasks or None)
+        """
+        data_quality = self._assess_data_quality(raw_data, data_summary)
+        adaptive_thresholds = self._adapt_thresholds(data_quality)
+        
+        logger.info(f"Data quality: {data_quality['quality_level']}, Adaptive thresholds: {adaptive_thresholds}")
+        
+        # Keyed on everything the prompt is built from (raw_data enters via data_quality)
+        if self.response_cache is None:
+            return data_quality, adaptive_thresholds, None
         
+        cached = self.response_cache.lookup(
+            user_query, (data_summary, adaptive_thresholds, data_quality), version=data_end_date(data_summary)
+        )
+        if cached is not None:
+            logger.info(f"Response cache hit: reusing plan with {len(cached)} subtasks")
+        return data_quality, adaptive_thresholds, cached
+    
+    def _parse_plan(
+        self,
+        response: str,
+        user_query: str,
+        data_summary: Dict[str, Any],
+        data_quality: Dict[str, Any],
+        adaptive_thresholds: Dict[str, float],
+        start_time: float
+    ) -> Dict[str, Any]:
+        """Parse the LLM response into subtasks (default plan on invalid JSON) and log completion"""
         try:
-            logger.info(f"Planning for query: {user_query}")
+            plan = parse_json_response(response)
+            subtasks = plan.get("subtasks", [])
             
-            # Assess data quality and adapt thresholds
-            data_quality = self._assess_data_quality(raw_data, data_summary)
-            adaptive_thresholds = self._adapt_thresholds(data_quality)
+        except orjson.JSONDecodeError as e:
+            logger.error(f"Failed to parse planner response: {e}")
             
-            logger.info(f"Data quality: {data_quality['quality_level']}, Adaptive thresholds: {adaptive_thresholds}")
+            # Log JSON parse error
+            self.logger.log_agent_error(
+                "planner",
+                error=JSONParseError(
+                    f"Failed to parse JSON from LLM response: {e}",
+                    raw_response=response,
+                    agent_name="planner"
+                ),
+                context={"raw_response": response[:500]}
+            )
             
-            system_prompt = self._get_system_prompt()
-            user_prompt = self._build_prompt(user_query, data_summary, adaptive_thresholds, data_quality)
+            # Fallback to default plan
+            fallback_plan = self._get_default_plan()
             
-            # Log LLM call
-            llm_start = time.time()
-            response = self.llm.generate(user_prompt, system_prompt)
-            llm_duration = time.time() - llm_start
+            duration = time.time() - start_time
+            self.logger.log_agent_complete(
+                "planner",
+                output_data={
+                    "subtasks": fallback_plan,
+                    "subtask_count": len(fallback_plan),
+                    "fallback_used": True
+                },
+                duration_seconds=duration
+            )
             
-            self.logger.log_llm_call(
-                agent_name="planner",
-                prompt=user_prompt,
-                system_prompt=system_prompt,
-                response=response,
-                model=self.llm.model,
-                duration_seconds=llm_duration
+            # Return dict with fallback plan and data_quality
+            return {
+                'plan': fallback_plan,
+                'data_quality': data_quality
+            }
+        
+        logger.info(f"Generated plan with {len(subtasks)} subtasks")
+        
+        self._store_plan(user_query, data_summary, data_quality, adaptive_thresholds, subtasks)
+        return self._complete_plan(subtasks, data_quality, adaptive_thresholds, start_time)
+    
+    def _store_plan(
+        self,
+        user_query: str,
+        data_summary: Dict[str, Any],
+        data_quality: Dict[str, Any],
+        adaptive_thresholds: Dict[str, float],
+        subtasks: List[Dict[str, Any]]
+    ) -> None:
+        """Cache parsed subtasks under the inputs the prompt was built from (if enabled)"""
+        if self.response_cache is not None:
+            self.response_cache.update(
+                user_query, (data_summary, adaptive_thresholds, data_quality), subtasks,
+                version=data_end_date(data_summary)
             )
+    
+    def _complete_plan(
+        self,
+        subtasks: List[Dict[str, Any]],
+        data_quality: Dict[str, Any],
+        adaptive_thresholds: Dict[str, float],
+        start_time: float,
+        **output_extra
+    ) -> Dict[str, Any]:
+        """Log completion and build the plan() result"""
+        output_data = {
+            "subtasks": subtasks,
+            "subtask_count": len(subtasks),
+            "data_quality": data_quality,
+            "adaptive_thresholds": adaptive_thresholds,
+            **output_extra
+        }
+        
+        duration = time.time() - start_time
+        self.logger.log_agent_complete("planner", output_data=output_data, duration_seconds=duration)
+        
+        # Return dict with plan and data_quality (for pipeline compatibility)
+        return {
+            'plan': subtasks,
+            'data_quality': data_quality
+        }
+    
+    def _log_batch(self) -> ContextManager[Any]:
+        """Write the post-LLM log entries (LLM call, parse outcome, completion) in one append"""
+        if isinstance(self.logger, StructuredLogger):
+            return self.logger.batch()
+        return nullcontext()
+    
+    def _log_llm_call(self, user_prompt: str, system_prompt: str, response: str, duration: float) -> None:
+        """Log an LLM call made by the planner"""
+        self.logger.log_llm_call(
+            agent_name="planner",
+            prompt=user_prompt,
+            system_prompt=system_prompt,
+            response=response,
+            model=self.llm.model,
+            duration_seconds=duration
+        )
+    
+    def _log_error(self, error: Exception, user_query: Any, start_time: float) -> None:
+        """Log an unexpected planner error"""
+        self.logger.log_agent_error(
+            "planner",
+            error=error,
+            context={
+                "user_query": user_query,
+                "duration_before_error": time.time() - start_time
+            }
+        )
+    
+    def plan_many(
+        self,
+        queries: List[Tuple[str, Dict[str, Any]]],
+        raw_data: Any = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Create plans for several independent queries with batched LLM calls
+        
+        Up to _MAX_PLAN_BATCH queries share one call, amortizing the system prompt
+        and network round-trip (e.g. the panels of a dashboard). Queries answered
+        by the response cache are not sent.
+        
+        Args:
+            queries: (user_query, data_summary) pairs
+            raw_data: Optional pandas DataFrame for data quality assessment
             
-            # Parse JSON response
-            try:
-                plan = json.loads(response)
-                subtasks = plan.get("subtasks", [])
-                
-                logger.info(f"Generated plan with {len(subtasks)} subtasks")
-                
-                # Log completion
-                duration = time.time() - start_time
-                self.logger.log_agent_complete(
-                    "planner",
-                    output_data={
-                        "subtasks": subtasks,
-                        "subtask_count": len(subtasks),
-                        "data_quality": data_quality,
-                        "adaptive_thresholds": adaptive_thresholds
-                    },
-                    duration_seconds=duration
-                )
-                
-                # Return dict with plan and data_quality (for pipeline compatibility)
-                return {
-                    'plan': subtasks,
-                    'data_quality': data_quality
-                }
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse planner response: {e}")
-                
-                # Log JSON parse error
-                self.logger.log_agent_error(
-                    "planner",
-                    error=JSONParseError(
-                        f"Failed to parse JSON from LLM response: {e}",
-                        raw_response=response,
-                        agent_name="planner"
-                    ),
-                    context={"raw_response": response[:500]}
-                )
-                
-                # Fallback to default plan
-                fallback_plan = self._get_default_plan()
-                
-                duration = time.time() - start_time
-                self.logger.log_agent_complete(
-                    "planner",
-                    output_data={
-                        "subtasks": fallback_plan,
-                        "subtask_count": len(fallback_plan),
-                        "fallback_used": True
-                    },
-                    duration_seconds=duration
-                )
+        Returns:
+            List of dicts as returned by plan(), one per query (same order)
+        """
+        if not queries:
+            return []
+        
+        self.logger.log_agent_start(
+            "planner",
+            input_data={"query_count": len(queries)}
+        )
+        
+        start_time = time.time()
+        
+        try:
+            logger.info(f"Planning {len(queries)} queries in batches of up to {_MAX_PLAN_BATCH}")
+            
+            # Quality, thresholds and the rendered dataset context depend only on the
+            # summary (raw_data is shared), so they are built once per distinct summary
+            per_summary = {}
+            contexts = []
+            for user_query, data_summary in queries:
+                if id(data_summary) not in per_summary:
+                    data_quality = self._assess_data_quality(raw_data, data_summary)
+                    adaptive_thresholds = self._adapt_thresholds(data_quality)
+                    per_summary[id(data_summary)] = (
+                        adaptive_thresholds,
+                        data_quality,
+                        self._build_dataset_context(data_summary, adaptive_thresholds, data_quality)
+                    )
+                contexts.append((user_query, data_summary, *per_summary[id(data_summary)]))
+            
+            subtask_lists = [None] * len(contexts)
+            if self.response_cache is not None:
+                for index, context in enumerate(contexts):
+                    subtask_lists[index] = self.response_cache.lookup(
+                        context[0], context[1:4], version=data_end_date(context[1])
+                    )
+            
+            pending = [index for index, subtasks in enumerate(subtask_lists) if subtasks is None]
+            fallback_count = 0
+            system_prompt = self._get_system_prompt()
+            
+            for batch_start in range(0, len(pending), _MAX_PLAN_BATCH):
+                batch = pending[batch_start:batch_start + _MAX_PLAN_BATCH]
+                user_prompt = self._build_batch_prompt([(contexts[index][0], contexts[index][4]) for index in batch])
                 
-                # Return dict with fallback plan and data_quality
-                return {
-                    'plan': fallback_plan,
-                    'data_quality': data_quality
-                }
+                llm_start = time.time()
+                response = self.llm.generate(user_prompt, system_prompt)
+                self._log_llm_call(user_prompt, system_prompt, response, time.time() - llm_start)
                 
+                by_id = self._split_batch_response(response, len(batch))
+                for query_id, index in enumerate(batch, 1):
+                    subtasks = by_id.get(str(query_id))
+                    if subtasks is None:
+                        fallback_count += 1
+                        subtasks = self._get_default_plan()
+                    elif self.response_cache is not None:
+                        self.response_cache.update(
+                            contexts[index][0], contexts[index][1:4], subtasks,
+                            version=data_end_date(contexts[index][1])
+                        )
+                    subtask_lists[index] = subtasks
+            
+            duration = time.time() - start_time
+            self.logger.log_agent_complete(
+                "planner",
+                output_data={
+                    "query_count": len(queries),
+                    "subtask_count": sum(len(subtasks) for subtasks in subtask_lists),
+                    "llm_calls": -(-len(pending) // _MAX_PLAN_BATCH),
+                    "cache_hits": len(queries) - len(pending),
+                    "fallback_queries": fallback_count
+                },
+                duration_seconds=duration
+            )
+            
+            return [
+                {'plan': subtasks, 'data_quality': context[3]}
+                for subtasks, context in zip(subtask_lists, contexts)
+            ]
+            
         except Exception as e:
-            # Log unexpected error
             duration = time.time() - start_time
             self.logger.log_agent_error(
                 "planner",
                 error=e,
                 context={
-                    "user_query": user_query,
+                    "query_count": len(queries),
                     "duration_before_error": duration
                 }
             )
@@ -180,17 +581,16 @@ class PlannerAgent:
         # If raw data available, calculate actual CV
         if raw_data is not None:
             try:
-                # Calculate coefficient of variation for key metrics
-                for metric in ['ctr', 'roas', 'cvr']:
-                    if metric in raw_data.columns:
-                        values = raw_data[metric].dropna()
-                        if len(values) > 0 and values.mean() != 0:
-                            cv = values.std() / values.mean()
-                            quality["cv_values"][metric] = cv
+                # Coefficient of variation for key metrics in one reduction (NaNs skipped)
+                columns = [metric for metric in ('ctr', 'roas', 'cvr') if metric in raw_data.columns]
+                metrics = raw_data[columns]
+                means = metrics.mean()
+                cvs = (metrics.std() / means)[means.notna() & (means != 0)]
+                quality["cv_values"] = cvs.to_dict()
                 
                 # Determine variance level based on average CV
                 if quality["cv_values"]:
-                    avg_cv = np.mean(list(quality["cv_values"].values()))
+                    avg_cv = cvs.mean(skipna=False)
                     
                     if avg_cv > self.high_variance_cv:
                         quality["variance_level"] = "high"
@@ -247,107 +647,102 @@ class PlannerAgent:
         
         logger.info(f"Adapting thresholds for variance_level='{variance_level}' (quality='{quality_str}')")
         
-        # Use ThresholdManager with priority resolution and adaptive multipliers
-        thresholds = {
-            "ctr_threshold": self.threshold_mgr.get_threshold(
-                metric="ctr",
-                data_quality=quality_str,
-                use_adaptive=True
-            ),
-            "cvr_threshold": self.threshold_mgr.get_threshold(
-                metric="cvr",
-                data_quality=quality_str,
-                use_adaptive=True
-            ),
-            "roas_threshold": self.threshold_mgr.get_threshold(
-                metric="roas",
-                data_quality=quality_str,
-                use_adaptive=True
-            )
-        }
+        thresholds = self._adapted_thresholds.get(quality_str)
+        if thresholds is None:
+            # Use ThresholdManager with priority resolution and adaptive multipliers
+            thresholds = {
+                "ctr_threshold": self.threshold_mgr.get_threshold(
+                    metric="ctr",
+                    data_quality=quality_str,
+                    use_adaptive=True
+                ),
+                "cvr_threshold": self.threshold_mgr.get_threshold(
+                    metric="cvr",
+                    data_quality=quality_str,
+                    use_adaptive=True
+                ),
+                "roas_threshold": self.threshold_mgr.get_threshold(
+                    metric="roas",
+                    data_quality=quality_str,
+                    use_adaptive=True
+                )
+            }
+            self._adapted_thresholds[quality_str] = thresholds
         
-        return thresholds
+        # Copy so callers can adjust their thresholds without touching the memo
+        return dict(thresholds)
     
     def _get_system_prompt(self) -> str:
         """System prompt defining planner role and output format"""
-        return """You are a Marketing Analytics Planner Agent. Your job is to decompose user queries into structured subtasks.
-
-**Your responsibilities:**
-1. Understand what the user wants to know about Facebook ad performance
-2. Break down the query into specific, actionable subtasks
-3. Return a valid JSON structure
-
-**Output format (strict JSON):**
-{
-  "subtasks": [
-    {
-      "task_id": "1",
-      "task_type": "analyze_metric_trend",
-      "description": "Analyze ROAS trend over time",
-      "parameters": {
-        "metric": "roas",
-        "timeframe": "last_7_days"
-      }
-    },
-    {
-      "task_id": "2",
-      "task_type": "identify_underperformers",
-      "description": "Find campaigns with low CTR",
-      "parameters": {
-        "metric": "ctr",
-        "threshold": 0.01
-      }
-    }
-  ]
-}
-
-**Available task types:**
-- analyze_metric_trend: Track how a metric changed over time
-- identify_underperformers: Find low-performing campaigns/creatives
-- segment_analysis: Compare performance across dimensions (platform, country, creative_type)
-- creative_analysis: Analyze creative message effectiveness
-
-**Available metrics (ONLY use these):**
-- Base metrics: spend, impressions, clicks, purchases, revenue
-- Calculated metrics: ctr, roas, cpc, cpm, cvr
-- Aliases: sales (use 'revenue'), conversions (use 'purchases'), cost (use 'spend')
-
-**CRITICAL: When user asks about "sales", use metric="revenue". When they ask about "conversions", use metric="purchases".**
-
-**Rules:**
-- Always output valid JSON
-- Include 2-4 subtasks
-- Be specific in descriptions
-- Use ONLY metrics from the list above
-- Set reasonable parameters based on the data summary"""
+        return _SYSTEM_PROMPT
 
     def _build_prompt(self, user_query: str, data_summary: Dict[str, Any], 
                       adaptive_thresholds: Dict[str, float], data_quality: Dict[str, Any]) -> str:
-        """Build prompt with query, context, and adaptive thresholds"""
-        return f"""User Query: "{user_query}"
-
-Dataset Context:
-- Date Range: {data_summary['date_range']['start']} to {data_summary['date_range']['end']} ({data_summary['date_range']['days']} days)
-- Total Campaigns: {data_summary['campaigns']['count']}
-- Total Spend: ${data_summary['metrics']['total_spend']:,.2f}
-- Average ROAS: {data_summary['metrics']['avg_roas']:.2f}
-- Average CTR: {data_summary['metrics']['avg_ctr']:.2%}
-
-Data Quality Assessment:
-- Variance Level: {data_quality['quality_level']}
-- Sample Size: {data_quality['sample_size']} campaigns
+        """
+        Build prompt with context, adaptive thresholds and query
+        
+        Ordered stable-to-volatile (dataset context before the query) so that
+        successive queries over the same data share a prefix the provider can cache.
+        """
+        dataset_context = self._build_dataset_context(data_summary, adaptive_thresholds, data_quality)
+        return f'{dataset_context}\n\nUser Query: "{user_query}"\n\n{_PLAN_INSTRUCTIONS}'
 
-Adaptive Thresholds (adjusted for data characteristics):
-- CTR Threshold: {adaptive_thresholds['ctr_threshold']:.4f}
-- CVR Threshold: {adaptive_thresholds['cvr_threshold']:.4f}
-- ROAS Threshold: {adaptive_thresholds['roas_threshold']:.2f}
+    def _build_dataset_context(self, data_summary: Dict[str, Any],
+                               adaptive_thresholds: Dict[str, float], data_quality: Dict[str, Any]) -> str:
+        """Render the dataset context block (independent of the query)"""
+        date_range = data_summary['date_range']
+        metrics = data_summary['metrics']
+        dimensions = data_summary['dimensions']
+        return _DATASET_CONTEXT_TEMPLATE.format_map({
+            'start': date_range['start'],
+            'end': date_range['end'],
+            'days': date_range['days'],
+            'campaign_count': data_summary['campaigns']['count'],
+            'total_spend': metrics['total_spend'],
+            'avg_roas': metrics['avg_roas'],
+            'avg_ctr': metrics['avg_ctr'],
+            'quality_level': data_quality['quality_level'],
+            'sample_size': data_quality['sample_size'],
+            'ctr_threshold': adaptive_thresholds['ctr_threshold'],
+            'cvr_threshold': adaptive_thresholds['cvr_threshold'],
+            'roas_threshold': adaptive_thresholds['roas_threshold'],
+            'creative_types': list(dimensions['creative_types'].keys()),
+            'platforms': list(dimensions['platforms'].keys()),
+            'countries': list(dimensions['countries'].keys())
+        })
 
-Available Dimensions:
-- Creative Types: {list(data_summary['dimensions']['creative_types'].keys())}
-- Platforms: {list(data_summary['dimensions']['platforms'].keys())}
-- Countries: {list(data_summary['dimensions']['countries'].keys())}
+    def _build_batch_prompt(self, contexts: List[Tuple[str, str]]) -> str:
+        """Build one prompt covering several (user_query, dataset_context) pairs, each ordered like _build_prompt"""
+        sections = [
+            f'### QUERY {query_id}\n{dataset_context}\n\nUser Query: "{user_query}"'
+            for query_id, (user_query, dataset_context) in enumerate(contexts, 1)
+        ]
+        return "\n\n".join(sections) + f"\n\n{_BATCH_OUTPUT_INSTRUCTIONS}"
 
-Generate a structured plan with 2-4 subtasks to answer this query. Use the adaptive thresholds above when setting parameters for underperformer identification. Output ONLY valid JSON, no other text."""
+    def _split_batch_response(self, response: str, query_count: int) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Map query id -> subtasks from a batched LLM response
+        
+        Queries missing from the response (or all of them, if it is not valid
+        JSON) are absent from the mapping; the caller falls back for those.
+        """
+        by_id = {}
+        try:
+            parsed = parse_json_response(response)
+            for entry in parsed.get("results", []):
+                by_id[str(entry.get("query_id", "")).strip()] = entry.get("subtasks", [])
+        except (orjson.JSONDecodeError, AttributeError) as e:
+            logger.error(f"Failed to parse batched planner response: {e}")
+            self.logger.log_agent_error(
+                "planner",
+                error=JSONParseError(
+                    f"Failed to parse JSON from LLM response: {e}",
+                    raw_response=response,
+                    agent_name="planner"
+                ),
+                context={"raw_response": response[:500], "query_count": query_count}
+            )
+        return by_id
 
     def _get_default_plan(self) -> List[Dict[str, Any]]:
         """Fallback plan if LLM fails - uses ThresholdManager"""
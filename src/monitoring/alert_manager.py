@@ -6,11 +6,11 @@ and alert history tracking.
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import Deque, List, Dict, Any, Optional, Set
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from collections import defaultdict
+from collections import Counter, deque
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +22,18 @@ class AlertSeverity(Enum):
     INFO = "INFO"          # Informational only
 
 
-@dataclass
+# Rule framing the alert summary
+_SEPARATOR = "=" * 70
+
+# Console prefix per severity (padded so messages line up)
+_SEVERITY_EMOJI = {
+    AlertSeverity.CRITICAL: "🚨",
+    AlertSeverity.WARNING: "⚠️ ",
+    AlertSeverity.INFO: "ℹ️ "
+}
+
+
+@dataclass(slots=True)
 class Alert:
     """
     Represents a single alert from any agent.
@@ -43,19 +54,15 @@ class Alert:
     recommendation: Optional[str] = None
     timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
     alert_id: Optional[str] = None
+    _formatted: Optional[str] = field(default=None, init=False, repr=False, compare=False)
     
     def format(self) -> str:
-        """Format alert for console display."""
-        # Severity emoji
-        emoji_map = {
-            AlertSeverity.CRITICAL: "🚨",
-            AlertSeverity.WARNING: "⚠️ ",
-            AlertSeverity.INFO: "ℹ️ "
-        }
-        emoji = emoji_map[self.severity]
+        """Format alert for console display (built once, alerts are not modified after creation)."""
+        if self._formatted is not None:
+            return self._formatted
         
         lines = [
-            f"{emoji} {self.severity.value}: {self.message}",
+            f"{_SEVERITY_EMOJI[self.severity]} {self.severity.value}: {self.message}",
             f"   Source: {self.source}"
         ]
         
@@ -68,7 +75,8 @@ class Alert:
         if self.recommendation:
             lines.append(f"   💡 Recommendation: {self.recommendation}")
         
-        return "\n".join(lines)
+        self._formatted = "\n".join(lines)
+        return self._formatted
 
 
 class AlertManager:
@@ -95,10 +103,12 @@ class AlertManager:
         self.min_data_days = alert_config.get('min_data_days', 7)
         self.max_history = alert_config.get('alert_history_size', 100)
         
-        # Alert storage
+        # Alert storage (ordered list plus per-severity buckets and sources for filtering/summary)
         self.alerts: List[Alert] = []
-        self.alert_history: List[Alert] = []
-        self.alert_counts = defaultdict(int)  # Count by alert_id
+        self._alerts_by_severity: Dict[AlertSeverity, List[Alert]] = {s: [] for s in AlertSeverity}
+        self._sources: Set[str] = set()
+        self.alert_history: Deque[Alert] = deque(maxlen=self.max_history)
+        self.alert_counts: Counter = Counter()  # Count by alert_id
         
         logger.debug(f"AlertManager initialized (enabled={self.enabled})")
     
@@ -110,7 +120,7 @@ class AlertManager:
         details: Optional[Dict[str, Any]] = None,
         recommendation: Optional[str] = None,
         alert_id: Optional[str] = None
-    ) -> Alert:
+    ) -> Optional[Alert]:
         """
         Add new alert to the system.
         
@@ -123,7 +133,7 @@ class AlertManager:
             alert_id: ID for deduplication (optional)
         
         Returns:
-            Created Alert object
+            Created Alert object (None when alerts are disabled)
         """
         if not self.enabled:
             return None
@@ -138,15 +148,15 @@ class AlertManager:
         )
         
         self.alerts.append(alert)
+        self._alerts_by_severity[severity].append(alert)
+        self._sources.add(source)
         
         # Track alert history
         if alert_id:
             self.alert_counts[alert_id] += 1
         
-        # Maintain history size
+        # Maintain history size (deque drops the oldest entry)
         self.alert_history.append(alert)
-        if len(self.alert_history) > self.max_history:
-            self.alert_history.pop(0)
         
         return alert
     
@@ -156,7 +166,7 @@ class AlertManager:
         confidence: float,
         threshold: float,
         reason: str
-    ) -> Alert:
+    ) -> Optional[Alert]:
         """
         Add alert for low-confidence insight.
         
@@ -167,8 +177,11 @@ class AlertManager:
             reason: Why confidence is low
         
         Returns:
-            Created Alert object
+            Created Alert object (None when alerts are disabled)
         """
+        if not self.enabled:
+            return None
+        
         return self.add_alert(
             severity=AlertSeverity.WARNING,
             source="insight_agent",
@@ -188,7 +201,7 @@ class AlertManager:
         threshold: float,
         rejected_count: int,
         total_count: int
-    ) -> Alert:
+    ) -> Optional[Alert]:
         """
         Add alert for low quality score.
         
@@ -199,8 +212,11 @@ class AlertManager:
             total_count: Total insights evaluated
         
         Returns:
-            Created Alert object
+            Created Alert object (None when alerts are disabled)
         """
+        if not self.enabled:
+            return None
+        
         severity = AlertSeverity.CRITICAL if quality_score < 0.5 else AlertSeverity.WARNING
         
         return self.add_alert(
@@ -221,7 +237,7 @@ class AlertManager:
         self,
         days_missing: int,
         last_data_date: str
-    ) -> Alert:
+    ) -> Optional[Alert]:
         """
         Add alert for missing recent data.
         
@@ -230,8 +246,11 @@ class AlertManager:
             last_data_date: Date of most recent data
         
         Returns:
-            Created Alert object
+            Created Alert object (None when alerts are disabled)
         """
+        if not self.enabled:
+            return None
+        
         return self.add_alert(
             severity=AlertSeverity.CRITICAL,
             source="health_checker",
@@ -249,7 +268,7 @@ class AlertManager:
         self,
         age_hours: float,
         threshold_hours: int
-    ) -> Alert:
+    ) -> Optional[Alert]:
         """
         Add alert for stale data.
         
@@ -258,8 +277,11 @@ class AlertManager:
             threshold_hours: Maximum acceptable age
         
         Returns:
-            Created Alert object
+            Created Alert object (None when alerts are disabled)
         """
+        if not self.enabled:
+            return None
+        
         return self.add_alert(
             severity=AlertSeverity.WARNING,
             source="health_checker",
@@ -287,10 +309,10 @@ class AlertManager:
         Returns:
             List of matching alerts
         """
-        filtered = self.alerts
-        
         if severity:
-            filtered = [a for a in filtered if a.severity == severity]
+            filtered = list(self._alerts_by_severity[severity])
+        else:
+            filtered = self.alerts
         
         if source:
             filtered = [a for a in filtered if a.source == source]
@@ -304,69 +326,65 @@ class AlertManager:
         Returns:
             Dictionary with alert counts and details
         """
+        critical_count = len(self._alerts_by_severity[AlertSeverity.CRITICAL])
         return {
             'total_alerts': len(self.alerts),
-            'critical_count': len(self.get_alerts(AlertSeverity.CRITICAL)),
-            'warning_count': len(self.get_alerts(AlertSeverity.WARNING)),
-            'info_count': len(self.get_alerts(AlertSeverity.INFO)),
-            'sources': list(set(a.source for a in self.alerts)),
-            'has_critical': any(a.severity == AlertSeverity.CRITICAL for a in self.alerts)
+            'critical_count': critical_count,
+            'warning_count': len(self._alerts_by_severity[AlertSeverity.WARNING]),
+            'info_count': len(self._alerts_by_severity[AlertSeverity.INFO]),
+            'sources': list(self._sources),
+            'has_critical': critical_count > 0
         }
     
     def log_all_alerts(self) -> None:
-        """Log all alerts to console with formatting."""
+        """Log all alerts to console with formatting (one log record per section)."""
         if not self.alerts:
             logger.info("✅ No alerts - all systems nominal")
             return
         
         summary = self.get_summary()
         
-        logger.warning("=" * 70)
-        logger.warning(f"📬 ALERT SUMMARY: {summary['total_alerts']} alert(s)")
-        logger.warning("=" * 70)
+        logger.warning(f"{_SEPARATOR}\n📬 ALERT SUMMARY: {summary['total_alerts']} alert(s)\n{_SEPARATOR}")
         
-        # Log critical alerts first
+        # Critical alerts first, then warnings, finally info
         critical = self.get_alerts(AlertSeverity.CRITICAL)
         if critical:
-            logger.critical("")
-            logger.critical(f"🚨 CRITICAL ALERTS: {len(critical)}")
-            for alert in critical:
-                for line in alert.format().split('\n'):
-                    logger.critical(line)
-                logger.critical("")
-        
-        # Then warnings
+            logger.critical(self._format_section("🚨 CRITICAL ALERTS", critical))
+        
         warnings = self.get_alerts(AlertSeverity.WARNING)
         if warnings:
-            logger.warning("")
-            logger.warning(f"⚠️  WARNING ALERTS: {len(warnings)}")
-            for alert in warnings:
-                for line in alert.format().split('\n'):
-                    logger.warning(line)
-                logger.warning("")
-        
-        # Finally info
+            logger.warning(self._format_section("⚠️  WARNING ALERTS", warnings))
+        
         info = self.get_alerts(AlertSeverity.INFO)
         if info:
-            logger.info("")
-            logger.info(f"ℹ️  INFO ALERTS: {len(info)}")
-            for alert in info:
-                logger.info(alert.format())
-                logger.info("")
-        
-        logger.warning("=" * 70)
+            logger.info(self._format_section("ℹ️  INFO ALERTS", info))
         
-        # Add recommendations summary
+        # Closing separator, with the recommendations summary when there are critical alerts
+        footer = [_SEPARATOR]
         if critical:
-            logger.warning("💡 RECOMMENDED ACTIONS:")
-            for i, alert in enumerate(critical, 1):
-                if alert.recommendation:
-                    logger.warning(f"   {i}. {alert.recommendation} ({alert.source})")
-            logger.warning("=" * 70)
+            footer.append("💡 RECOMMENDED ACTIONS:")
+            footer.extend(
+                f"   {i}. {alert.recommendation} ({alert.source})"
+                for i, alert in enumerate(critical, 1)
+                if alert.recommendation
+            )
+            footer.append(_SEPARATOR)
+        logger.warning("\n".join(footer))
+    
+    @staticmethod
+    def _format_section(header: str, alerts: List[Alert]) -> str:
+        """Header line and formatted alerts of one severity, each followed by a blank line."""
+        lines = ["", f"{header}: {len(alerts)}"]
+        for alert in alerts:
+            lines.append(alert.format())
+            lines.append("")
+        return "\n".join(lines)
     
     def clear_alerts(self) -> None:
         """Clear current alerts (keep history)."""
         self.alerts = []
+        self._alerts_by_severity = {s: [] for s in AlertSeverity}
+        self._sources = set()
     
     def get_recurring_alerts(self, min_count: int = 3) -> List[tuple]:
         """
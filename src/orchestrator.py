@@ -44,7 +44,7 @@ class AgentOrchestrator:
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.logger = StructuredLogger()
+        self.logger = StructuredLogger(level=config.get("logging", {}).get("level", "INFO"))
         
         # Initialize alert manager
         self.alert_manager = AlertManager(config)
@@ -65,7 +65,11 @@ class AgentOrchestrator:
         self.data_agent = DataAgent(self.data_loader, self.config, self.logger)
         self.insight_agent = InsightAgent(self.llm_client, self.logger, self.alert_manager, config)
         self.evaluator = EvaluatorAgent(config, self.logger, self.alert_manager)
-        self.creative_gen = CreativeGeneratorAgent(self.llm_client, self.logger)
+        self.creative_gen = CreativeGeneratorAgent(
+            self.llm_client,
+            self.logger,
+            row_token_budget=config["llm"].get("row_token_budget", 400)
+        )
         
         # Initialize health checker
         self.health_checker = HealthChecker(config, self.alert_manager)
@@ -1,6 +1,8 @@
 """
 Configuration loader utility
 """
+import copy
+import functools
 import yaml
 from pathlib import Path
 from typing import Dict, Any
@@ -9,10 +11,20 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=8)
+def _read_yaml(resolved_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse a YAML file (memoized on path + modification time)"""
+    with open(resolved_path, 'r') as f:
+        return yaml.safe_load(f)
+
+
 def load_config(config_path: str = "config/config.yaml") -> Dict[str, Any]:
     """
     Load YAML configuration file
     
+    The parsed file is cached per path and modification time, so repeated loads
+    skip the YAML parse; each caller gets its own deep copy to mutate freely.
+    
     Args:
         config_path: Path to config.yaml
         
@@ -24,8 +36,8 @@ def load_config(config_path: str = "config/config.yaml") -> Dict[str, Any]:
         if not path.exists():
             raise FileNotFoundError(f"Config file not found: {config_path}")
         
-        with open(path, 'r') as f:
-            config = yaml.safe_load(f)
+        resolved = path.resolve()
+        config = copy.deepcopy(_read_yaml(str(resolved), resolved.stat().st_mtime_ns))
         
         logger.info(f"Configuration loaded from {config_path}")
         return config
@@ -46,10 +58,15 @@ def setup_logging(config: Dict[str, Any]):
     level = log_config.get("level", "INFO")
     log_format = log_config.get("format", "text")
     
-    # Configure root logger
-    logging.basicConfig(
-        level=getattr(logging, level),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    # Configure root logger (only once; repeated calls just update the level
+    # instead of stacking duplicate handlers)
+    root = logging.getLogger()
+    if root.hasHandlers():
+        root.setLevel(getattr(logging, level))
+    else:
+        logging.basicConfig(
+            level=getattr(logging, level),
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
     
     logger.info(f"Logging configured: level={level}, format={log_format}")
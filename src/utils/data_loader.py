@@ -12,6 +12,18 @@ from src.utils.exceptions import DataValidationError, SchemaError
 logger = logging.getLogger(__name__)
 
 
+def safe_divide(numerator: pd.Series, denominator: pd.Series) -> np.ndarray:
+    """
+    Element-wise ratio with NaN where the denominator is zero
+    
+    Single np.divide pass with a where-mask; avoids the denominator copy that
+    Series.replace(0, np.nan) allocates.
+    """
+    num = numerator.to_numpy(dtype=np.float64)
+    den = denominator.to_numpy(dtype=np.float64)
+    return np.divide(num, den, out=np.full(len(den), np.nan), where=den != 0)
+
+
 class DataLoader:
     """Load and preprocess Facebook Ads dataset"""
     
@@ -175,8 +187,8 @@ class DataLoader:
         }).reset_index()
         
         # Calculate ROAS
-        daily['roas'] = daily['revenue'] / daily['spend'].replace(0, np.nan)
-        daily['ctr'] = daily['clicks'] / daily['impressions'].replace(0, np.nan)
+        daily['roas'] = safe_divide(daily['revenue'], daily['spend'])
+        daily['ctr'] = safe_divide(daily['clicks'], daily['impressions'])
         
         # Recent vs previous comparison
         recent = daily.tail(window)
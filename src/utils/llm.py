@@ -3,20 +3,156 @@ LLM interface module - Groq API client
 """
 import requests
 import json
-from typing import Dict, Any, Optional
+import re
+import orjson
+import asyncio
+import functools
+import threading
+from typing import Dict, Any, Iterator, List, Optional
 import logging
 import os
 
 from src.utils.exceptions import LLMAPIError, TimeoutError as CustomTimeoutError
 from src.utils.retry import exponential_backoff_with_jitter
+from src.utils.semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# Keep-alive connections per host in the shared pool (covers agenerate fan-out on the default executor)
+_POOL_MAXSIZE = 32
+
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+# First markdown code block (closing fence optional for truncated responses)
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|$)", re.DOTALL)
+
+
+def strip_code_fence(response: str) -> str:
+    """Extract JSON from markdown code blocks if present (single regex scan)"""
+    match = _JSON_BLOCK_RE.search(response)
+    return match.group(1) if match else response
+
+
+# Decodes one JSON value from an offset and reports where it ended (trailing text ignored)
+_JSON_DECODER = json.JSONDecoder()
+
+
+def parse_json_response(response: str) -> Any:
+    """
+    Parse the JSON object in an LLM response (fenced, bare, or wrapped in prose)
+    
+    Fast path is orjson on the fence-stripped text. If that fails, the object
+    starting at the first "{" is decoded in place up to its matching brace, so
+    surrounding prose (or a stray fence) does not need another split/copy.
+    
+    Raises:
+        orjson.JSONDecodeError: No parseable JSON object in the response
+    """
+    text = strip_code_fence(response)
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError as error:
+        start = text.find("{")
+        if start == -1:
+            raise
+        try:
+            return _JSON_DECODER.raw_decode(text, start)[0]
+        except json.JSONDecodeError:
+            raise error from None
+
+
+class JSONArrayStreamParser:
+    """
+    Incrementally extracts the objects of a named JSON array from streamed text
+    
+    Text is fed as it streams in; each object is returned as soon as its closing
+    brace arrives. Code fences and any text before the array are skipped because
+    scanning starts at the array's key (e.g. "recommendations", "insights").
+    """
+    
+    def __init__(self, array_key: str):
+        self._array_start_re = re.compile(rf'"{re.escape(array_key)}"\s*:\s*\[')
+        self.buffer = ""
+        self._pos = 0              # next unscanned index in buffer
+        self._in_array = False
+        self._done = False
+        self._depth = 0            # nesting depth inside the array
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+    
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Append streamed text and return any objects completed by it"""
+        self.buffer += text
+        if self._done:
+            return []
+        
+        if not self._in_array:
+            # Re-scan a small overlap in case the key was split across chunks
+            match = self._array_start_re.search(self.buffer, max(0, self._pos - 32))
+            if not match:
+                self._pos = len(self.buffer)
+                return []
+            self._in_array = True
+            self._pos = match.end()
+        
+        items = []
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._item_start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    self._done = True  # end of the array
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    try:
+                        items.append(orjson.loads(buffer[self._item_start:i + 1]))
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Skipping malformed streamed array item: {e}")
+                    self._item_start = None
+        
+        self._pos = len(buffer)
+        return items
+
+
+def shared_session() -> requests.Session:
+    """
+    Process-wide HTTP session so every LLMClient reuses pooled keep-alive connections
+    
+    A bare requests.post() opens (and TLS-negotiates) a new connection per call.
+    """
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=_POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _shared_session = session
+        return _shared_session
+
 
 class LLMClient:
     """Groq API client for fast LLM inference"""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], session: Optional[requests.Session] = None):
         self.model = config.get("model", "llama-3.3-70b-versatile")
         # Try environment variable first, then config
         self.api_key = os.getenv("LLM_API_KEY") or config.get("api_key", "")
@@ -27,12 +163,54 @@ class LLMClient:
         if not self.api_key:
             raise LLMAPIError("Groq API key required. Set LLM_API_KEY environment variable or add to config")
         
+        # Connection pool shared across clients unless one is injected
+        self.session = session or shared_session()
+        
+        # Optional semantic cache (opt-in, mainly for iterative dev / drift-simulation reruns);
+        # replaying one sampled answer would hide the variation temperature > 0 asks for
+        cache_config = config.get("cache", {})
+        self.cache: Optional[SemanticCache] = None
+        if cache_config.get("enabled", False) and self.temperature > 0:
+            logger.info("Semantic cache enabled in config but skipped: it needs llm.temperature 0")
+        elif cache_config.get("enabled", False):
+            self.cache = SemanticCache(
+                threshold=cache_config.get("similarity_threshold", 0.97),
+                path=cache_config.get("path", "reports/.cache/llm_semantic_cache.pkl"),
+                max_entries=cache_config.get("max_entries", 500)
+            )
+    
+    def generate(self, prompt: str, system_prompt: Optional[str] = None, cache_query: Optional[str] = None) -> str:
+        """
+        Generate text from prompt, answering from the semantic cache when enabled
+        
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system prompt for context
+            cache_query: User query embedded in the prompt; the cache matches
+                reworded queries over an otherwise identical prompt (without it,
+                only identical prompts are answered from the cache)
+            
+        Returns:
+            Generated text response
+        """
+        if self.cache is None:
+            return self._request(prompt, system_prompt)
+        
+        namespace = SemanticCache.namespace(self.model, system_prompt)
+        cached = self.cache.get(prompt, namespace, query=cache_query)
+        if cached is not None:
+            return cached
+        
+        response = self._request(prompt, system_prompt)
+        self.cache.add(prompt, response, namespace, query=cache_query)
+        return response
+        
     @exponential_backoff_with_jitter(
         max_retries=3,
         base_delay=1.0,
         retriable_exceptions=(LLMAPIError, CustomTimeoutError, requests.exceptions.RequestException)
     )
-    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def _request(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """
         Generate text from prompt using Groq API with automatic retry on failures
         
@@ -48,35 +226,14 @@ class LLMClient:
             CustomTimeoutError: Request timed out
         """
         try:
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
-            
-            response = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.model,
-                    "messages": messages,
-                    "temperature": self.temperature,
-                    "max_tokens": self.max_tokens
-                },
+            response = self.session.post(
+                GROQ_CHAT_URL,
+                headers=self._headers(),
+                json=self._payload(prompt, system_prompt),
                 timeout=self.timeout
             )
             
-            # Handle HTTP errors with proper categorization
-            if response.status_code == 429:
-                raise LLMAPIError("Rate limit exceeded", status_code=429, provider="groq")
-            elif response.status_code == 401:
-                raise LLMAPIError("Invalid API key", status_code=401, provider="groq")
-            elif response.status_code >= 500:
-                raise LLMAPIError("Groq server error", status_code=response.status_code, provider="groq")
-            
-            response.raise_for_status()
+            self._check_status(response)
             result = response.json()
             
             logger.info(f"Groq generation successful (model={self.model})")
@@ -108,3 +265,108 @@ class LLMClient:
         except requests.exceptions.RequestException as e:
             logger.error(f"Groq API request error: {e}")
             raise LLMAPIError(f"Groq API request failed: {e}", provider="groq")
+    
+    async def agenerate(
+        self, prompt: str, system_prompt: Optional[str] = None, cache_query: Optional[str] = None
+    ) -> str:
+        """
+        Async variant of generate() so independent LLM calls can be awaited concurrently
+        
+        The HTTP client is blocking, so the call (including its retry/backoff) runs on
+        the event loop's default thread pool instead of stalling the loop.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system prompt for context
+            cache_query: User query embedded in the prompt (see generate())
+            
+        Returns:
+            Generated text response
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.generate, prompt, system_prompt, cache_query)
+        )
+    
+    def stream(self, prompt: str, system_prompt: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream the completion as text deltas (server-sent events, stream=True)
+        
+        Lets callers start parsing before generation finishes. Not retried or
+        cached: a failure mid-stream is surfaced to the caller.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system prompt for context
+            
+        Yields:
+            Content deltas in arrival order
+            
+        Raises:
+            LLMAPIError: API request failed (rate limit, auth, model error)
+            CustomTimeoutError: Request timed out
+        """
+        try:
+            response = self.session.post(
+                GROQ_CHAT_URL,
+                headers=self._headers(),
+                json={**self._payload(prompt, system_prompt), "stream": True},
+                timeout=self.timeout,
+                stream=True
+            )
+            
+            # Inside the with block so an error status still releases the connection
+            with response:
+                self._check_status(response)
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+            
+            logger.info(f"Groq stream complete (model={self.model})")
+            
+        except requests.exceptions.Timeout as e:
+            logger.error(f"Groq API timeout after {self.timeout}s: {e}")
+            raise CustomTimeoutError(f"Groq API timeout after {self.timeout}s", timeout_seconds=self.timeout)
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Groq API stream error: {e}")
+            raise LLMAPIError(f"Groq API stream failed: {e}", provider="groq")
+    
+    def _headers(self) -> Dict[str, str]:
+        """Request headers for the Groq API"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _payload(self, prompt: str, system_prompt: Optional[str]) -> Dict[str, Any]:
+        """Chat-completions request body"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+    
+    @staticmethod
+    def _check_status(response: requests.Response) -> None:
+        """Handle HTTP errors with proper categorization"""
+        if response.status_code == 429:
+            raise LLMAPIError("Rate limit exceeded", status_code=429, provider="groq")
+        elif response.status_code == 401:
+            raise LLMAPIError("Invalid API key", status_code=401, provider="groq")
+        elif response.status_code >= 500:
+            raise LLMAPIError("Groq server error", status_code=response.status_code, provider="groq")
+        
+        response.raise_for_status()
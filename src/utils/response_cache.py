@@ -0,0 +1,312 @@
+"""
+Response cache for parsed agent results
+
+Dashboard refreshes and pipeline retries call the planner / insight agent with
+identical inputs. Keyed on a hash of the normalized inputs, a hit returns the
+previously parsed subtasks or insights without an LLM round-trip or JSON parse.
+Optionally, near-duplicate queries over identical data are matched too.
+Unlike the opt-in SemanticCache (near-identical prompts, raw responses, on
+disk), this is in-process and only used for deterministic sampling.
+"""
+import copy
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.utils.semantic_cache import HashingEmbedder
+
+logger = logging.getLogger(__name__)
+
+# Words and numbers of a query, for parameter extraction
+_QUERY_TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)?|[a-z]+(?:'[a-z]+)?")
+
+# Timeframe words (units singularized) that change what a query asks for
+_TIMEFRAME_WORDS = frozenset({
+    "hour", "day", "week", "month", "quarter", "year", "weekend", "today", "yesterday",
+    "last", "this", "past", "previous", "next", "current", "since", "ytd", "mtd", "wtd"
+})
+
+# Negations; a negated query asks the opposite question
+_NEGATION_WORDS = frozenset({"not", "no", "never", "without", "except", "excluding", "exclude"})
+
+
+def _json_default(obj: Any) -> Any:
+    """Serialize read-only mappings as dicts (so keys get sorted), anything else via str"""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    return str(obj)
+
+
+def data_end_date(summary: Any) -> Optional[str]:
+    """Last date covered by a data summary (date_range.end), used as cache version"""
+    if not isinstance(summary, Mapping):
+        return None
+    date_range = summary.get("date_range")
+    return date_range.get("end") if isinstance(date_range, Mapping) else None
+
+
+def query_parameters(query: str) -> Tuple[str, ...]:
+    """
+    Parameters of a query that must match exactly for a near-duplicate hit
+
+    Numbers, timeframe words and negations, in order of appearance:
+    "last 7 days" and "last 30 days" embed almost identically but ask for
+    different data.
+    """
+    params = []
+    for token in _QUERY_TOKEN_PATTERN.findall(query.lower()):
+        if token[0].isdigit():
+            params.append(token)
+        elif token.endswith("n't") or token in _NEGATION_WORDS:
+            params.append("not")
+        else:
+            word = token[:-1] if token.endswith("s") and token[:-1] in _TIMEFRAME_WORDS else token
+            if word in _TIMEFRAME_WORDS:
+                params.append(word)
+    return tuple(params)
+
+
+class InMemoryCache:
+    """
+    LRU cache of input hash -> parsed result with optional TTL
+
+    Mirrors the lookup/update API of LangChain's BaseCache. Entries are tied to a
+    data version (the dataset's last date): a lookup or update with a new
+    version drops everything cached for the old data.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (stored_at, value)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*inputs: Any) -> str:
+        """Hash inputs into a cache key (dict order and numpy/pandas scalars normalized)"""
+        payload = json.dumps(inputs, sort_keys=True, default=_json_default)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+    def lookup(self, key: str, version: Optional[str] = None) -> Optional[Any]:
+        """
+        Return a copy of the cached value, or None on miss/expiry
+
+        Args:
+            key: Key from make_key()
+            version: Data version the caller is working on
+
+        Returns:
+            Deep copy of the cached value (callers may mutate it) or None
+        """
+        self._sync_version(version)
+
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl_seconds is not None:
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def update(self, key: str, value: Any, version: Optional[str] = None) -> None:
+        """
+        Store a copy of value, evicting the least recently used entry when full
+
+        Args:
+            key: Key from make_key()
+            value: Parsed result to cache
+            version: Data version the value was computed from
+        """
+        self._sync_version(version)
+
+        self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _sync_version(self, version: Optional[str]) -> None:
+        """Invalidate entries computed from older data"""
+        if version is not None and version != self._version:
+            if self._entries:
+                logger.debug(f"Response cache invalidated: data version {self._version} -> {version}")
+                self._entries.clear()
+            self._version = version
+
+
+class SemanticResponseCache:
+    """
+    Near-duplicate query matching of parsed results, scoped to identical context
+
+    Candidates are only the earlier queries asked over the same context key (same
+    data, thresholds, analysis results) with the same query_parameters()
+    (numbers, timeframe, negations), compared by cosine similarity of their
+    embeddings, so a hit never crosses datasets or timeframes. The hashed n-gram
+    embedding catches rewordings (case, punctuation, filler words), not
+    paraphrases. LRU over contexts, with the most recent max_queries kept per
+    context.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        threshold: float = 0.95,
+        max_contexts: int = 32,
+        max_queries: int = 32
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.max_contexts = max_contexts
+        self.max_queries = max_queries
+
+        # context key -> {"vectors": np.ndarray (n, dim), "values": [Any], "params": [tuple]}
+        self._contexts: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, query: str, context_key: str, version: Optional[str] = None) -> Optional[Any]:
+        """Return a copy of the value cached for the most similar query, if above threshold"""
+        self._sync_version(version)
+
+        bucket = self._contexts.get(context_key)
+        params = query_parameters(query)
+        candidates = [
+            i for i, cached_params in enumerate(bucket["params"]) if cached_params == params
+        ] if bucket else []
+        if not candidates:
+            self.misses += 1
+            return None
+
+        similarities = bucket["vectors"][candidates] @ self.embedder(query)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self._contexts.move_to_end(context_key)
+        self.hits += 1
+        logger.info(f"Semantic response cache hit (similarity={similarities[best]:.3f})")
+        return copy.deepcopy(bucket["values"][candidates[best]])
+
+    def update(self, query: str, context_key: str, value: Any, version: Optional[str] = None) -> None:
+        """Store a copy of value for query within its context"""
+        self._sync_version(version)
+
+        vector = self.embedder(query)[np.newaxis, :]
+        params = query_parameters(query)
+        bucket = self._contexts.get(context_key)
+        if bucket is None:
+            self._contexts[context_key] = {"vectors": vector, "values": [copy.deepcopy(value)], "params": [params]}
+            if len(self._contexts) > self.max_contexts:
+                self._contexts.popitem(last=False)
+        else:
+            bucket["vectors"] = np.vstack([bucket["vectors"], vector])[-self.max_queries:]
+            bucket["values"] = (bucket["values"] + [copy.deepcopy(value)])[-self.max_queries:]
+            bucket["params"] = (bucket["params"] + [params])[-self.max_queries:]
+            self._contexts.move_to_end(context_key)
+
+    def _sync_version(self, version: Optional[str]) -> None:
+        """Invalidate entries computed from older data"""
+        if version is not None and version != self._version:
+            self._contexts.clear()
+            self._version = version
+
+
+class ResponseCache:
+    """
+    Agent-facing cache: exact lookups, then optional near-duplicate query matching
+
+    Entries are addressed by (query, context), where context is everything else
+    the prompt is built from.
+    """
+
+    def __init__(self, exact: InMemoryCache, semantic: Optional[SemanticResponseCache] = None):
+        self.exact = exact
+        self.semantic = semantic
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counts (exact and semantic hits both count as hits)"""
+        semantic_hits = self.semantic.hits if self.semantic is not None else 0
+        return {
+            "hits": self.exact.hits + semantic_hits,
+            "misses": self.exact.misses - semantic_hits,
+            "semantic_hits": semantic_hits
+        }
+
+    def lookup(self, query: Optional[str], context: Tuple[Any, ...], version: Optional[str] = None) -> Optional[Any]:
+        """
+        Return a copy of the cached result for this query and context, or None
+
+        Args:
+            query: User query (None/empty queries only hit exactly)
+            context: Remaining prompt inputs (dicts, lists, scalars)
+            version: Data version the caller is working on
+        """
+        context_key = InMemoryCache.make_key(*context)
+        cached = self.exact.lookup(InMemoryCache.make_key(query, context_key), version=version)
+        if cached is None and self.semantic is not None and query:
+            cached = self.semantic.lookup(query, context_key, version=version)
+        return cached
+
+    def update(self, query: Optional[str], context: Tuple[Any, ...], value: Any, version: Optional[str] = None) -> None:
+        """Store a parsed result for this query and context"""
+        context_key = InMemoryCache.make_key(*context)
+        self.exact.update(InMemoryCache.make_key(query, context_key), value, version=version)
+        if self.semantic is not None and query:
+            self.semantic.update(query, context_key, value, version=version)
+
+
+def build_response_cache(config: Dict[str, Any]) -> Optional[ResponseCache]:
+    """
+    Create the agent response cache from the llm.response_cache config
+
+    Returns None when disabled, or when the LLM samples (temperature > 0):
+    replaying one sampled answer for every identical request would hide the
+    variation the temperature asks for.
+    """
+    llm_config = config.get("llm", {})
+    cache_config = llm_config.get("response_cache", {})
+    if not cache_config.get("enabled", False):
+        return None
+
+    if llm_config.get("temperature", 0.5) > 0:
+        logger.info("Response cache enabled in config but skipped: it needs llm.temperature 0")
+        return None
+
+    semantic = None
+    semantic_config = cache_config.get("semantic", {})
+    if semantic_config.get("enabled", False):
+        semantic = SemanticResponseCache(threshold=semantic_config.get("similarity_threshold", 0.95))
+
+    return ResponseCache(
+        InMemoryCache(
+            max_entries=cache_config.get("max_entries", 128),
+            ttl_seconds=cache_config.get("ttl_seconds")
+        ),
+        semantic
+    )
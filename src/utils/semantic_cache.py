@@ -0,0 +1,238 @@
+"""
+Semantic cache for LLM responses
+
+Repeated prompts (e.g. re-running the pipeline in a dev loop, or after a drift
+simulation) are answered from disk instead of re-invoking the LLM.
+
+A rendered prompt is mostly fixed template text, which would dominate any
+whole-prompt embedding, so similarity is only ever computed on the varying
+part: the user query passed by the caller. Everything else in the prompt
+(dataset context, instructions) must match exactly, and so must the numbers in
+the query. Without a query only identical prompts hit.
+
+Embeddings are hashed word uni/bi-gram vectors (L2-normalized), so lookups are a
+single matrix-vector product and need no model download or extra dependency.
+"""
+import atexit
+import hashlib
+import logging
+import pickle
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9_.%$-]+")
+
+# Numeric literals (with thousands separators / decimals) that must match exactly
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Persisted layout version; files written by other versions are ignored
+_STORE_FORMAT = 2
+
+
+def numbers_signature(text: str) -> str:
+    """Digest of the sequence of numbers in text (equal only if every number matches)"""
+    numbers = "\x1f".join(_NUMBER_PATTERN.findall(text))
+    return hashlib.blake2b(numbers.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class HashingEmbedder:
+    """Maps text to a fixed-size, L2-normalized bag of hashed word n-grams"""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def __call__(self, text: str) -> np.ndarray:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vector
+
+        # crc32 is stable across processes (unlike hash()), so persisted vectors stay valid
+        indices = np.fromiter(
+            (zlib.crc32(f.encode("utf-8")) % self.dim for f in features),
+            dtype=np.int64,
+            count=len(features)
+        )
+        np.add.at(vector, indices, 1.0)
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    Cache of prompt -> response, matching reworded user queries by embedding similarity
+
+    Entries are bucketed by namespace (model + system prompt) and a hash of the
+    prompt with the query removed, so a hit never crosses agents, models or
+    data; within a bucket only queries with exactly the same numbers are
+    compared. At most max_entries are kept (least recently used buckets are
+    dropped first). Persisted with pickle every save_every additions and at interpreter exit
+    (or on flush()), so hits survive across runs. Thread-safe: agenerate() runs
+    generate() on executor threads.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        threshold: float = 0.97,
+        path: Optional[str] = "reports/.cache/llm_semantic_cache.pkl",
+        max_entries: int = 500,
+        save_every: int = 20
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.save_every = save_every
+
+        # bucket key -> {"vectors": np.ndarray (n, dim), "responses": [str], "numbers": [str]}
+        self._store: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+        if self.path:
+            atexit.register(self.flush)
+
+    @staticmethod
+    def namespace(model: str, system_prompt: Optional[str]) -> str:
+        """Build the namespace key for a model/system prompt pair"""
+        digest = hashlib.sha1((system_prompt or "").encode("utf-8")).hexdigest()[:16]
+        return f"{model}:{digest}"
+
+    @staticmethod
+    def _bucket_key(namespace: str, prompt: str, query: Optional[str]) -> str:
+        """Namespace plus an exact hash of the prompt's fixed part (everything but the query)"""
+        fixed = prompt.replace(query, "\x00") if query else prompt
+        digest = hashlib.blake2b(fixed.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{namespace}:{digest}"
+
+    def get(self, prompt: str, namespace: str = "default", query: Optional[str] = None) -> Optional[str]:
+        """
+        Return the cached response for this prompt, if any
+
+        Args:
+            prompt: Full user prompt
+            namespace: Cache namespace (see namespace())
+            query: Varying part of the prompt (the user query) to match by
+                similarity; without it only an identical prompt hits
+
+        Returns:
+            Cached response or None on miss
+        """
+        key = self._bucket_key(namespace, prompt, query)
+        signature = numbers_signature(query or "")
+        vector = self.embedder(query) if query else None
+
+        with self._lock:
+            bucket = self._store.get(key)
+            candidates = [
+                i for i, numbers in enumerate(bucket["numbers"]) if numbers == signature
+            ] if bucket else []
+            if not candidates:
+                self.misses += 1
+                return None
+
+            if vector is None:
+                self._store.move_to_end(key)
+                self.hits += 1
+                logger.info("Semantic cache hit (identical prompt)")
+                return bucket["responses"][candidates[-1]]
+
+            similarities = bucket["vectors"][candidates] @ vector
+            best = int(np.argmax(similarities))
+
+            if similarities[best] >= self.threshold:
+                self._store.move_to_end(key)
+                self.hits += 1
+                logger.info(f"Semantic cache hit (similarity={similarities[best]:.3f})")
+                return bucket["responses"][candidates[best]]
+
+            self.misses += 1
+            return None
+
+    def add(self, prompt: str, response: str, namespace: str = "default", query: Optional[str] = None) -> None:
+        """
+        Store a response (persisted every save_every additions)
+
+        Args:
+            prompt: Full user prompt
+            response: LLM response to cache
+            namespace: Cache namespace (see namespace())
+            query: Varying part of the prompt (see get())
+        """
+        key = self._bucket_key(namespace, prompt, query)
+        signature = numbers_signature(query or "")
+        vector = self.embedder(query or "")[np.newaxis, :]
+
+        with self._lock:
+            bucket = self._store.get(key)
+            if bucket is None:
+                self._store[key] = {"vectors": vector, "responses": [response], "numbers": [signature]}
+            else:
+                bucket["vectors"] = np.vstack([bucket["vectors"], vector])[-self.max_entries:]
+                bucket["responses"] = (bucket["responses"] + [response])[-self.max_entries:]
+                bucket["numbers"] = (bucket["numbers"] + [signature])[-self.max_entries:]
+                self._store.move_to_end(key)
+
+            while len(self._store) > 1 and self._size() > self.max_entries:
+                self._store.popitem(last=False)
+
+            self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self._save()
+
+    def flush(self) -> None:
+        """Persist entries added since the last save"""
+        with self._lock:
+            if self._unsaved:
+                self._save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size()
+
+    def _size(self) -> int:
+        """Number of cached responses (caller holds the lock)"""
+        return sum(len(bucket["responses"]) for bucket in self._store.values())
+
+    def _load(self) -> None:
+        """Load persisted entries (a corrupt/incompatible file is ignored)"""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "rb") as f:
+                saved = pickle.load(f)
+            if not isinstance(saved, dict) or saved.get("format") != _STORE_FORMAT:
+                logger.info(f"Ignoring semantic cache {self.path} from an older format")
+                return
+            self._store = saved["store"]
+            logger.debug(f"Loaded semantic cache: {len(self)} entries from {self.path}")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable semantic cache {self.path}: {e}")
+            self._store = OrderedDict()
+
+    def _save(self) -> None:
+        """Persist entries to disk (caller holds the lock)"""
+        self._unsaved = 0
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "wb") as f:
+                pickle.dump({"format": _STORE_FORMAT, "store": self._store}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"Failed to persist semantic cache: {e}")
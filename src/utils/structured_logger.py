@@ -3,11 +3,13 @@ Structured logging for full observability and debugging
 """
 import json
 import logging
+import threading
 import time
 import traceback
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional
 from functools import wraps
 
 logger = logging.getLogger(__name__)
@@ -25,10 +27,28 @@ class StructuredLogger:
     - contextual data (input, output, duration, etc.)
     """
     
-    def __init__(self, log_file: str = "logs/execution.jsonl"):
+    def __init__(
+        self,
+        log_file: str = "logs/execution.jsonl",
+        level: str = "INFO",
+        max_pending: int = 64,
+        max_pending_seconds: float = 2.0
+    ):
         self.log_file = Path(log_file)
         self.log_file.parent.mkdir(parents=True, exist_ok=True)
         
+        # Entries below this level are skipped before their payload is built
+        self.level = getattr(logging, level.upper(), logging.INFO)
+        
+        # Serialized lines held back while inside batch() (depth > 0); flushed
+        # early once max_pending lines or max_pending_seconds have accumulated
+        self.max_pending = max_pending
+        self.max_pending_seconds = max_pending_seconds
+        self._batch_depth = 0
+        self._pending: List[str] = []
+        self._pending_since = 0.0
+        self._lock = threading.Lock()
+        
         # Clear previous logs or append
         # For new runs, we'll append with session separator
         self._write_session_start()
@@ -44,18 +64,70 @@ class StructuredLogger:
         }
         self._write_log(session_marker)
     
+    def is_enabled(self, level: int) -> bool:
+        """Whether entries at this level are written"""
+        return level >= self.level
+    
     def _get_timestamp(self) -> str:
         """Get ISO 8601 timestamp"""
         return datetime.now().isoformat()
     
     def _write_log(self, log_entry: Dict[str, Any]):
-        """Write a single log entry as JSON line"""
+        """Write a single log entry as JSON line (held back until the end of a batch())"""
         try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry, default=str) + '\n')
+            line = json.dumps(log_entry, default=str) + '\n'
+            with self._lock:
+                if not self._batch_depth:
+                    self._append(line)
+                    return
+                if not self._pending:
+                    self._pending_since = time.monotonic()
+                self._pending.append(line)
+                if (len(self._pending) >= self.max_pending
+                        or time.monotonic() - self._pending_since >= self.max_pending_seconds):
+                    self._flush_pending()
         except Exception as e:
             logger.error(f"Failed to write structured log: {e}")
     
+    def _append(self, text: str):
+        """Append serialized lines to the log file"""
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(text)
+    
+    def _flush_pending(self):
+        """Write held-back lines in one append (caller holds the lock)"""
+        lines, self._pending = self._pending, []
+        self._append("".join(lines))
+    
+    @contextmanager
+    def batch(self) -> Iterator["StructuredLogger"]:
+        """
+        Buffer entries and write them with a single append when the block exits
+        
+        Meant for short bursts of entries (an agent's post-LLM logging), not a
+        whole run: entries are serialized when logged and keep their order, are
+        written even if the block raises, and are flushed early once max_pending
+        lines or max_pending_seconds have accumulated. Nested batches flush with
+        the outermost one.
+        
+        Usage:
+            with structured_logger.batch():
+                structured_logger.log_llm_call(...)
+                structured_logger.log_agent_complete(...)
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._pending:
+                    try:
+                        self._flush_pending()
+                    except Exception as e:
+                        logger.error(f"Failed to write structured log: {e}")
+    
     def log_agent_start(self, agent_name: str, input_data: Any = None, **kwargs):
         """
         Log when an agent starts processing
@@ -65,15 +137,16 @@ class StructuredLogger:
             input_data: Input parameters/data passed to agent
             **kwargs: Additional context
         """
-        log_entry = {
-            "timestamp": self._get_timestamp(),
-            "level": "INFO",
-            "agent": agent_name,
-            "event": "start",
-            "input": input_data,
-            **kwargs
-        }
-        self._write_log(log_entry)
+        if self.is_enabled(logging.INFO):
+            log_entry = {
+                "timestamp": self._get_timestamp(),
+                "level": "INFO",
+                "agent": agent_name,
+                "event": "start",
+                "input": input_data,
+                **kwargs
+            }
+            self._write_log(log_entry)
         logger.info(f"[{agent_name.upper()}] Starting...")
     
     def log_agent_complete(
@@ -92,16 +165,17 @@ class StructuredLogger:
             duration_seconds: How long the agent took
             **kwargs: Additional context (e.g., confidence_score)
         """
-        log_entry = {
-            "timestamp": self._get_timestamp(),
-            "level": "INFO",
-            "agent": agent_name,
-            "event": "complete",
-            "output": output_data,
-            "duration_seconds": round(duration_seconds, 3) if duration_seconds else None,
-            **kwargs
-        }
-        self._write_log(log_entry)
+        if self.is_enabled(logging.INFO):
+            log_entry = {
+                "timestamp": self._get_timestamp(),
+                "level": "INFO",
+                "agent": agent_name,
+                "event": "complete",
+                "output": output_data,
+                "duration_seconds": round(duration_seconds, 3) if duration_seconds else None,
+                **kwargs
+            }
+            self._write_log(log_entry)
         
         duration_msg = f" ({duration_seconds:.2f}s)" if duration_seconds else ""
         logger.info(f"[{agent_name.upper()}] Complete{duration_msg}")
@@ -122,26 +196,27 @@ class StructuredLogger:
             context: Additional context about what was being processed
             attempt: Retry attempt number (if applicable)
         """
-        log_entry = {
-            "timestamp": self._get_timestamp(),
-            "level": "ERROR",
-            "agent": agent_name,
-            "event": "error",
-            "error_type": type(error).__name__,
-            "error_message": str(error),
-            "context": context,
-            "attempt": attempt,
-            "recoverable": getattr(error, 'recoverable', False),
-            "stack_trace": traceback.format_exc().split('\n')
-        }
-        
-        # Add error-specific attributes if available
-        if hasattr(error, 'status_code'):
-            log_entry["status_code"] = error.status_code
-        if hasattr(error, 'raw_response'):
-            log_entry["raw_response"] = error.raw_response[:500]  # Truncate long responses
-        
-        self._write_log(log_entry)
+        if self.is_enabled(logging.ERROR):
+            log_entry = {
+                "timestamp": self._get_timestamp(),
+                "level": "ERROR",
+                "agent": agent_name,
+                "event": "error",
+                "error_type": type(error).__name__,
+                "error_message": str(error),
+                "context": context,
+                "attempt": attempt,
+                "recoverable": getattr(error, 'recoverable', False),
+                "stack_trace": traceback.format_exc().split('\n')
+            }
+            
+            # Add error-specific attributes if available
+            if hasattr(error, 'status_code'):
+                log_entry["status_code"] = error.status_code
+            if hasattr(error, 'raw_response'):
+                log_entry["raw_response"] = error.raw_response[:500]  # Truncate long responses
+            
+            self._write_log(log_entry)
         logger.error(f"[{agent_name.upper()}] Error: {error}")
     
     def log_llm_call(
@@ -168,6 +243,9 @@ class StructuredLogger:
             tokens_used: Number of tokens consumed
             error: Error if call failed
         """
+        if not self.is_enabled(logging.ERROR if error else logging.INFO):
+            return
+        
         log_entry = {
             "timestamp": self._get_timestamp(),
             "level": "ERROR" if error else "INFO",
@@ -209,20 +287,49 @@ class StructuredLogger:
             details: Details about what passed/failed
             **kwargs: Additional context
         """
-        log_entry = {
-            "timestamp": self._get_timestamp(),
-            "level": "WARNING" if not passed else "INFO",
-            "event": "validation",
-            "validation_type": validation_type,
-            "passed": passed,
-            "details": details,
-            **kwargs
-        }
-        self._write_log(log_entry)
+        if self.is_enabled(logging.WARNING if not passed else logging.INFO):
+            log_entry = {
+                "timestamp": self._get_timestamp(),
+                "level": "WARNING" if not passed else "INFO",
+                "event": "validation",
+                "validation_type": validation_type,
+                "passed": passed,
+                "details": details,
+                **kwargs
+            }
+            self._write_log(log_entry)
         
         status = "✅ PASSED" if passed else "❌ FAILED"
         logger.info(f"[VALIDATION] {validation_type}: {status}")
     
+    def log_validation_batch(
+        self,
+        validations: List[Dict[str, Any]],
+        **kwargs
+    ):
+        """
+        Log a batch of validation checks as a single entry (one write)
+        
+        Args:
+            validations: Records with validation_type, passed and details (as in log_validation)
+            **kwargs: Additional context
+        """
+        passed_count = sum(1 for v in validations if v.get("passed"))
+        all_passed = passed_count == len(validations)
+        if self.is_enabled(logging.INFO if all_passed else logging.WARNING):
+            log_entry = {
+                "timestamp": self._get_timestamp(),
+                "level": "INFO" if all_passed else "WARNING",
+                "event": "validation_batch",
+                "count": len(validations),
+                "passed_count": passed_count,
+                "validations": validations,
+                **kwargs
+            }
+            self._write_log(log_entry)
+        
+        logger.info(f"[VALIDATION] {passed_count}/{len(validations)} passed")
+    
     def log_retry_attempt(
         self,
         agent_name: str,
@@ -241,17 +348,18 @@ class StructuredLogger:
             reason: Why it's retrying (error message)
             next_delay_seconds: How long until next retry
         """
-        log_entry = {
-            "timestamp": self._get_timestamp(),
-            "level": "WARNING",
-            "agent": agent_name,
-            "event": "retry_attempt",
-            "attempt": attempt_number,
-            "max_attempts": max_attempts,
-            "reason": reason,
-            "next_delay_seconds": round(next_delay_seconds, 2) if next_delay_seconds else None
-        }
-        self._write_log(log_entry)
+        if self.is_enabled(logging.WARNING):
+            log_entry = {
+                "timestamp": self._get_timestamp(),
+                "level": "WARNING",
+                "agent": agent_name,
+                "event": "retry_attempt",
+                "attempt": attempt_number,
+                "max_attempts": max_attempts,
+                "reason": reason,
+                "next_delay_seconds": round(next_delay_seconds, 2) if next_delay_seconds else None
+            }
+            self._write_log(log_entry)
         
         delay_msg = f" Retrying in {next_delay_seconds:.1f}s..." if next_delay_seconds else ""
         logger.warning(
@@ -272,6 +380,9 @@ class StructuredLogger:
             value: Metric value
             context: Additional context
         """
+        if not self.is_enabled(logging.INFO):
+            return
+        
         log_entry = {
             "timestamp": self._get_timestamp(),
             "level": "INFO",
@@ -294,6 +405,9 @@ class StructuredLogger:
             summary_type: Type of summary (dataset, analysis_result, etc.)
             data: Summary data
         """
+        if not self.is_enabled(logging.INFO):
+            return
+        
         log_entry = {
             "timestamp": self._get_timestamp(),
             "level": "INFO",
@@ -123,13 +123,15 @@ class ThresholdManager:
         Returns:
             Resolved threshold value
         """
-        # Build cache key
-        cache_key = f"{metric}|{campaign_id or 'none'}|{data_quality or 'none'}"
+        # Build cache key (adaptive and base lookups for the same quality differ)
+        adaptive = use_adaptive and bool(data_quality)
+        cache_key = f"{metric}|{campaign_id or 'none'}|{data_quality or 'none'}|{'adaptive' if adaptive else 'base'}"
         
-        # Check cache
-        if cache_key in self._cache:
-            logger.debug(f"Cache hit: {cache_key} → {self._cache[cache_key]}")
-            return self._cache[cache_key]
+        # Check cache (single lookup; the evaluator resolves the same keys every run)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Cache hit: %s → %s", cache_key, cached)
+            return cached
         
         logger.info(f"Resolving threshold for metric='{metric}', campaign='{campaign_id}', quality='{data_quality}'")
         
@@ -157,7 +159,7 @@ class ThresholdManager:
         
         # Priority 4: Apply adaptive multiplier if requested
         final_threshold = base_threshold
-        if use_adaptive and data_quality:
+        if adaptive:
             multiplier = self._get_adaptive_multiplier(metric, data_quality)
             if multiplier != 1.0:
                 final_threshold = base_threshold * multiplier
@@ -166,7 +168,7 @@ class ThresholdManager:
         # Cache result
         self._cache[cache_key] = final_threshold
         
-        logger.info(f"Final threshold: {final_threshold:.6f} (source: {source}{' + adaptive' if use_adaptive and data_quality else ''})")
+        logger.info(f"Final threshold: {final_threshold:.6f} (source: {source}{' + adaptive' if adaptive else ''})")
         
         return final_threshold
     
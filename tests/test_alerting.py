@@ -196,6 +196,16 @@ class TestAlertManager(unittest.TestCase):
         # All 150 alerts should be in alerts list
         alerts = self.alert_manager.get_alerts()
         self.assertEqual(len(alerts), 150)
+    
+    def test_disabled_manager_skips_helpers(self):
+        """Test that helpers return None without building alerts when disabled"""
+        self.config["monitoring"]["alerts"]["enabled"] = False
+        manager = AlertManager(self.config)
+        
+        # total_count=0 would fail while formatting the pass rate if it got that far
+        self.assertIsNone(manager.add_quality_alert(0.3, 0.6, 0, 0))
+        self.assertIsNone(manager.add_low_confidence_alert("insight_1", 0.3, 0.5, "weak"))
+        self.assertEqual(manager.get_summary()["total_alerts"], 0)
 
 
 class TestHealthChecker(unittest.TestCase):
@@ -3,9 +3,11 @@ Unit tests for CreativeGenerator
 Tests creative recommendation generation and variations
 """
 
+import asyncio
+import json
 import unittest
 from unittest.mock import Mock
-from src.agents.creative_gen import CreativeGeneratorAgent
+from src.agents.creative_gen import CreativeGeneratorAgent, BatchingCreativeGenerator
 from src.utils.llm import LLMClient
 
 
@@ -295,5 +297,183 @@ class TestCreativeGeneratorEdgeCases(unittest.TestCase):
         self.assertEqual(len(creatives[0]["variations"]), 0)
 
 
+class TestCreativeGeneratorPromptBudget(unittest.TestCase):
+    """Test token-budgeted performer lists in the prompt"""
+
+    def _rows(self, n, message_len):
+        return [{"campaign_name": f"C{i}", "creative_message": "x" * message_len, "ctr": 0.01} for i in range(n)]
+
+    def test_rows_capped_at_five(self):
+        """Test short rows are still capped at five entries"""
+        gen = CreativeGeneratorAgent(Mock(spec=LLMClient), Mock())
+        packed = gen._pack_rows({"campaign": r["campaign_name"]} for r in self._rows(8, 0))
+        self.assertEqual(len(packed), 5)
+
+    def test_long_rows_trimmed_to_budget(self):
+        """Test long rows are packed only while they fit the budget"""
+        gen = CreativeGeneratorAgent(Mock(spec=LLMClient), Mock(), row_token_budget=120)
+        packed = gen._pack_rows({"message": r["creative_message"]} for r in self._rows(5, 200))
+        self.assertEqual(len(packed), 2)
+
+    def test_first_row_always_kept(self):
+        """Test an oversized first row is kept so the list is not empty"""
+        gen = CreativeGeneratorAgent(Mock(spec=LLMClient), Mock(), row_token_budget=10)
+        packed = gen._pack_rows({"message": r["creative_message"]} for r in self._rows(3, 200))
+        self.assertEqual(len(packed), 1)
+
+
+class TestCreativeGeneratorAsync(unittest.TestCase):
+    """Test async creative generation path"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_llm = Mock(spec=LLMClient)
+        self.mock_llm.model = "test-model"
+        self.mock_logger = Mock()
+        self.gen = CreativeGeneratorAgent(self.mock_llm, self.mock_logger)
+        self.underperformers = {
+            "top_underperformers": [
+                {"campaign_name": "Men ComfortMax Launch", "adset_name": "Adset-1", "ctr": 0.004, "spend": 500.0}
+            ]
+        }
+        self.dataset_context = {"summary": {"metrics": {"avg_ctr": 0.012}}}
+
+    def test_agenerate_creatives_parses_response(self):
+        """Test async generation awaits the LLM and parses recommendations"""
+        self.mock_llm.agenerate.return_value = "```json\n" + json.dumps(
+            {"recommendations": [{"campaign": "Men ComfortMax Launch", "creative_variations": []}]}
+        ) + "\n```"
+
+        recommendations = asyncio.run(
+            self.gen.agenerate_creatives(self.underperformers, {}, self.dataset_context)
+        )
+
+        self.assertEqual(len(recommendations), 1)
+        self.assertEqual(recommendations[0]["campaign"], "Men ComfortMax Launch")
+        self.mock_llm.agenerate.assert_awaited_once()
+        self.mock_llm.generate.assert_not_called()
+
+    def test_agenerate_creatives_fallback_on_bad_json(self):
+        """Test async generation uses the same fallback as the sync path"""
+        self.mock_llm.agenerate.return_value = "not json"
+
+        recommendations = asyncio.run(
+            self.gen.agenerate_creatives(self.underperformers, {}, self.dataset_context)
+        )
+
+        self.assertEqual(len(recommendations), 1)
+        self.assertEqual(recommendations[0]["creative_variations"][0]["variation_id"], "fallback_1")
+
+
+class TestCreativeGeneratorStreaming(unittest.TestCase):
+    """Test streaming creative generation"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_llm = Mock(spec=LLMClient)
+        self.mock_llm.model = "test-model"
+        self.mock_logger = Mock()
+        self.gen = CreativeGeneratorAgent(self.mock_llm, self.mock_logger)
+        self.underperformers = {
+            "top_underperformers": [{"campaign_name": "A", "adset_name": "Adset-1", "ctr": 0.004}]
+        }
+        self.dataset_context = {"summary": {"metrics": {"avg_ctr": 0.012}}}
+
+    def test_yields_each_recommendation_before_stream_ends(self):
+        """Test recommendations are emitted as soon as their object closes"""
+        text = "```json\n" + json.dumps({"recommendations": [
+            {"campaign": "A", "headline": "Braces {inside} \"strings\""},
+            {"campaign": "B", "creative_variations": [{"variation_id": "var_1"}]}
+        ]}) + "\n```"
+        consumed = []
+
+        def stream(prompt, system_prompt):
+            for i in range(0, len(text), 7):
+                consumed.append(i)
+                yield text[i:i + 7]
+
+        self.mock_llm.stream.side_effect = stream
+        iterator = self.gen.stream_creatives(self.underperformers, {}, self.dataset_context)
+
+        first = next(iterator)
+        self.assertEqual(first["campaign"], "A")
+        self.assertLess(len(consumed) * 7, len(text))
+        self.assertEqual([r["campaign"] for r in iterator], ["B"])
+
+    def test_stream_falls_back_on_bad_json(self):
+        """Test unparseable streams use the regular fallback"""
+        self.mock_llm.stream.return_value = iter(["not ", "json"])
+
+        recommendations = list(self.gen.stream_creatives(self.underperformers, {}, self.dataset_context))
+
+        self.assertEqual(recommendations[0]["creative_variations"][0]["variation_id"], "fallback_1")
+
+
+class TestCreativeGeneratorBatching(unittest.TestCase):
+    """Test batched creative generation"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_llm = Mock(spec=LLMClient)
+        self.mock_llm.model = "test-model"
+        self.mock_logger = Mock()
+        self.gen = CreativeGeneratorAgent(self.mock_llm, self.mock_logger)
+        self.dataset_context = {"summary": {"metrics": {"avg_ctr": 0.012}}}
+
+    def _batch(self, campaign):
+        return {
+            "underperformers": {
+                "top_underperformers": [{"campaign_name": campaign, "adset_name": "Adset-1", "ctr": 0.004}]
+            },
+            "top_performers": {},
+            "dataset_context": self.dataset_context
+        }
+
+    def test_batch_response_split_per_batch(self):
+        """Test one LLM call is split back into per-batch recommendations"""
+        self.mock_llm.generate.return_value = json.dumps({"batches": [
+            {"batch_id": "2", "recommendations": [{"campaign": "B"}]},
+            {"batch_id": "1", "recommendations": [{"campaign": "A"}]}
+        ]})
+
+        results = self.gen.generate_creatives_batch([self._batch("A"), self._batch("B")])
+
+        self.assertEqual(results, [[{"campaign": "A"}], [{"campaign": "B"}]])
+        self.mock_llm.generate.assert_called_once()
+        prompt = self.mock_llm.generate.call_args[0][0]
+        self.assertIn("### BATCH 1", prompt)
+        self.assertIn("### BATCH 2", prompt)
+
+    def test_missing_batch_uses_fallback(self):
+        """Test batches absent from the response fall back individually"""
+        self.mock_llm.generate.return_value = json.dumps({"batches": [
+            {"batch_id": "1", "recommendations": [{"campaign": "A"}]}
+        ]})
+
+        results = self.gen.generate_creatives_batch([self._batch("A"), self._batch("B")])
+
+        self.assertEqual(results[0], [{"campaign": "A"}])
+        self.assertEqual(results[1][0]["campaign"], "B")
+        self.assertEqual(results[1][0]["creative_variations"][0]["variation_id"], "fallback_1")
+
+    def test_batcher_coalesces_concurrent_requests(self):
+        """Test concurrent callers are served by a single batched LLM call"""
+        self.mock_llm.generate.return_value = json.dumps({"batches": [
+            {"batch_id": str(i), "recommendations": [{"campaign": c}]}
+            for i, c in enumerate("ABC", 1)
+        ]})
+        batcher = BatchingCreativeGenerator(self.gen, max_batch_size=8, max_wait_seconds=0.05)
+
+        async def run():
+            return await asyncio.gather(*(
+                batcher.generate_creatives(**self._batch(c)) for c in "ABC"
+            ))
+
+        results = asyncio.run(run())
+
+        self.assertEqual([r[0]["campaign"] for r in results], ["A", "B", "C"])
+        self.mock_llm.generate.assert_called_once()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -7,7 +7,7 @@ import unittest
 import pandas as pd
 import numpy as np
 from unittest.mock import Mock, patch
-from src.agents.data_agent import DataAgent
+from src.agents.data_agent import DataAgent, _timeframe_days
 
 
 class TestDataAgent(unittest.TestCase):
@@ -243,5 +243,194 @@ class TestDataAgentEdgeCases(unittest.TestCase):
         self.assertIsNotNone(summary)
 
 
+def _ads_frame(days=10):
+    """Small ads dataset with the columns the analysis methods group on"""
+    rows = []
+    for day in pd.date_range("2025-01-01", periods=days):
+        for i, (campaign, creative_type) in enumerate([("Camp A", "Image"), ("Camp B", "Video"), ("Camp C", "UGC")]):
+            impressions = 1000 * (i + 1)
+            clicks = 10 * (i + 1) + day.day
+            spend = 50.0 * (i + 1)
+            revenue = spend * (1 + i) + day.day
+            rows.append({
+                "campaign_name": campaign,
+                "adset_name": f"Adset-{i}",
+                "date": day,
+                "spend": spend,
+                "impressions": impressions,
+                "clicks": clicks,
+                "ctr": clicks / impressions,
+                "purchases": i + 1,
+                "revenue": revenue,
+                "roas": revenue / spend,
+                "creative_type": creative_type,
+                "creative_message": f"Message {i}",
+                "platform": "Facebook" if i % 2 == 0 else "Instagram",
+                "audience_type": "Broad",
+                "country": "US"
+            })
+    return pd.DataFrame(rows)
+
+
+class TestDataAgentAggregationCache(unittest.TestCase):
+    """Test aggregations are shared across subtasks"""
+
+    def setUp(self):
+        """Set up agent with an in-memory dataframe"""
+        self.agent = DataAgent(Mock(), {}, Mock())
+        self.agent.df = _ads_frame()
+
+    def test_repeated_subtasks_reuse_groupby(self):
+        """Test the daily aggregation is computed once for repeated trend subtasks"""
+        task = {"task_type": "analyze_metric_trend", "parameters": {"metric": "roas", "timeframe": "last_3_days"}}
+        with patch.object(pd.DataFrame, "groupby", wraps=self.agent.df.groupby) as groupby:
+            first = self.agent.execute_subtask(task)
+            second = self.agent.execute_subtask(task)
+        self.assertEqual(groupby.call_count, 1)
+        self.assertEqual(first, second)
+
+    def test_cache_invalidated_when_df_replaced(self):
+        """Test replacing the dataframe recomputes aggregations"""
+        task = {"task_type": "segment_analysis", "parameters": {"dimension": "platform", "metric": "roas"}}
+        before = self.agent.execute_subtask(task)
+        df = _ads_frame()
+        df["revenue"] = df["revenue"] * 2
+        self.agent.df = df
+        after = self.agent.execute_subtask(task)
+        self.assertAlmostEqual(after["segments"][0]["roas"], before["segments"][0]["roas"] * 2)
+
+    def test_underperformers_partial_sort(self):
+        """Test count covers all matches while only the worst 10 are returned, ascending"""
+        df = pd.concat([_ads_frame()] * 5, ignore_index=True)
+        df["adset_name"] = df["adset_name"] + "-" + (df.index % 15).astype(str)
+        self.agent.df = df
+        result = self.agent.execute_subtask({
+            "task_type": "identify_underperformers",
+            "parameters": {"metric": "ctr", "threshold": 1.0}
+        })
+        ctrs = [r["ctr"] for r in result["top_underperformers"]]
+        self.assertEqual(result["count"], 15)
+        self.assertEqual(len(ctrs), 10)
+        self.assertEqual(ctrs, sorted(ctrs))
+
+    def test_segment_top_k(self):
+        """Test top_k limits segments to the best ones"""
+        result = self.agent.execute_subtask({
+            "task_type": "segment_analysis",
+            "parameters": {"dimension": "creative_type", "metric": "roas", "top_k": 1}
+        })
+        self.assertEqual(len(result["segments"]), 1)
+        self.assertEqual(result["segments"][0]["creative_type"], "UGC")
+
+    def test_segment_default_cap(self):
+        """Test the data.max_segments default keeps the best and worst segments"""
+        agent = DataAgent(Mock(), {"data": {"max_segments": 2}}, Mock())
+        agent.df = self.agent.df
+        result = agent.execute_subtask({
+            "task_type": "segment_analysis",
+            "parameters": {"dimension": "creative_type", "metric": "roas"}
+        })
+        self.assertEqual([s["creative_type"] for s in result["segments"]], ["UGC", "Image"])
+        self.assertEqual(result["total_segments"], 3)
+        self.assertTrue(result["truncated"])
+
+    def test_segment_invalid_top_k(self):
+        """Test non-numeric or non-positive top_k falls back to a valid cap"""
+        agent = DataAgent(Mock(), {"data": {"max_segments": 2}}, Mock())
+        agent.df = self.agent.df
+        for top_k, expected in (("ten", 2), (0, 1), ("0", 1), (-3, 1)):
+            result = agent.execute_subtask({
+                "task_type": "segment_analysis",
+                "parameters": {"dimension": "creative_type", "metric": "roas", "top_k": top_k}
+            })
+            self.assertEqual(len(result["segments"]), expected)
+
+    def test_segment_nan_metric_ranks_last(self):
+        """Test segments with an undefined metric are kept last, capped or not"""
+        segments = pd.DataFrame({"roas": [1.0, np.nan, 3.0]}, index=pd.Index(["A", "B", "C"], name="platform"))
+        with patch.object(self.agent, "_get_by_dimension", return_value=segments):
+            for top_k, expected in ((None, ["C", "A", "B"]), (3, ["C", "A", "B"]), (2, ["C", "A"])):
+                result = self.agent.execute_subtask({
+                    "task_type": "segment_analysis",
+                    "parameters": {"dimension": "platform", "metric": "roas", "top_k": top_k}
+                })
+                self.assertEqual([s["platform"] for s in result["segments"]], expected)
+
+    def test_categorical_dimensions_match_object_results(self):
+        """Test category dtype dimensions give the same results without unobserved groups"""
+        tasks = [
+            {"task_type": "identify_underperformers", "parameters": {"metric": "roas", "threshold": 10}},
+            {"task_type": "creative_analysis", "parameters": {}}
+        ]
+        expected = [self.agent.execute_subtask(t) for t in tasks]
+
+        self.agent._categorize_dimensions()
+        self.assertEqual(self.agent.df["campaign_name"].dtype, "category")
+        self.assertEqual([self.agent.execute_subtask(t) for t in tasks], expected)
+
+    def test_categorical_value_counts(self):
+        """Test bincount value counts match pandas (NaN and unused categories dropped)"""
+        series = pd.Series(["b", "a", "b", None, "c", "b", "a"]).astype(
+            pd.CategoricalDtype(["a", "b", "c", "unused"])
+        )
+        counts = DataAgent._value_counts(series)
+        self.assertEqual(counts, {"b": 3, "a": 2, "c": 1})
+        self.assertEqual(list(counts), ["b", "a", "c"])
+
+    def test_zero_denominator_yields_nan(self):
+        """Test ratio metrics are NaN (not inf) when the denominator is zero"""
+        df = _ads_frame(days=1)
+        df.loc[df["campaign_name"] == "Camp A", ["impressions", "clicks", "spend"]] = 0
+        self.agent.df = df
+        grouped = self.agent._get_by_campaign_adset()
+        row = grouped.loc[("Camp A", "Adset-0")]
+        self.assertTrue(np.isnan(row["ctr"]))
+        self.assertTrue(np.isnan(row["roas"]))
+        self.assertTrue(np.isnan(row["cpc"]))
+
+    def test_dimension_counts_shared_read_only(self):
+        """Test dimension counts are the same cached objects and cannot be mutated"""
+        first = self.agent._get_dimension_counts()
+        second = self.agent._get_dimension_counts()
+        self.assertIs(first, second)
+        self.assertEqual(first["platforms"], {"Facebook": 20, "Instagram": 10})
+        with self.assertRaises(TypeError):
+            first["platforms"]["Facebook"] = 0
+
+    def test_top_k_positions_matches_pandas(self):
+        """Test partial-sort ranking matches nsmallest/nlargest, including tie order"""
+        values = np.array([3.0, 1.0, 2.0, 1.0, 5.0, 2.0, 1.0, 4.0])
+        series = pd.Series(values)
+        for k in (1, 2, 4, 10):
+            np.testing.assert_array_equal(
+                DataAgent._top_k_positions(values, k), series.nsmallest(k).index
+            )
+            np.testing.assert_array_equal(
+                DataAgent._top_k_positions(values, k, largest=True), series.nlargest(k).index
+            )
+
+    def test_row_metrics_derived_only_when_missing(self):
+        """Test ctr/roas are derived at load when absent and kept when present"""
+        df = _ads_frame(days=1)
+        df.loc[0, "roas"] = 0.5
+        self.agent.df = df.copy()
+        self.agent._derive_row_metrics()
+        pd.testing.assert_frame_equal(self.agent.df, df)
+
+        self.agent.df = df.drop(columns=["ctr", "roas"])
+        self.agent.df.loc[0, "spend"] = 0
+        self.agent._derive_row_metrics()
+        np.testing.assert_allclose(self.agent.df["ctr"], df["clicks"] / df["impressions"])
+        self.assertTrue(np.isnan(self.agent.df.loc[0, "roas"]))
+        self.assertAlmostEqual(self.agent.df.loc[1, "roas"], df.loc[1, "revenue"] / df.loc[1, "spend"])
+
+    def test_timeframe_days(self):
+        """Test timeframe parsing for common, uncommon and malformed values"""
+        self.assertEqual(_timeframe_days("last_14_days"), 14)
+        self.assertEqual(_timeframe_days("last_3_days"), 3)
+        self.assertEqual(_timeframe_days("last_week"), 7)
+        self.assertEqual(_timeframe_days("all_time"), 7)
+
+
 if __name__ == "__main__":
     unittest.main()
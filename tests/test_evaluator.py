@@ -3,6 +3,7 @@ Tests for Evaluator Agent
 """
 import pytest
 from src.agents.evaluator import EvaluatorAgent
+from src.utils.threshold_manager import ThresholdManager
 
 
 def test_evaluator_initialization():
@@ -139,3 +140,45 @@ def test_requires_retry():
         "overall_quality": 0.4
     }
     assert evaluator.requires_retry(bad_eval_2) == True
+
+
+def test_numerical_grounding():
+    """Test percentage claims are matched against analysis results"""
+    evaluator = EvaluatorAgent({"thresholds": {"confidence_min": 0.6}})
+    analysis_results = [{"metric": "ctr"}, {"change_pct": -40.5}]
+
+    assert evaluator._check_numerical_grounding({"hypothesis": "No claim here"}, analysis_results)
+    assert evaluator._check_numerical_grounding({"hypothesis": "CTR dropped 40%"}, analysis_results)
+    assert not evaluator._check_numerical_grounding({"hypothesis": "CTR dropped 10%"}, analysis_results)
+
+
+def test_rejected_insight_skips_content_checks():
+    """Test content checks only run once the structural checks pass"""
+    evaluator = EvaluatorAgent({"thresholds": {"confidence_min": 0.6}})
+    insight = {
+        "hypothesis": "CTR dropped 40%",
+        "evidence": ["CTR 1.2%", "Spend flat"],
+        "confidence": 0.3,
+        "reasoning": "Creative fatigue"
+    }
+
+    rejected = evaluator._validate_insight(insight, [{"change_pct": -40.0}], 0.6, 2)
+    assert not rejected["is_valid"]
+    assert "numerically_grounded" not in rejected["checks"]
+    assert rejected["skipped_checks"] == ["evidence_is_quantitative", "numerically_grounded"]
+    assert "quality_factors" not in rejected
+
+    accepted = evaluator._validate_insight({**insight, "confidence": 0.8}, [{"change_pct": -40.0}], 0.6, 2)
+    assert accepted["checks"]["numerically_grounded"]
+    assert accepted["quality_factors"]["completeness"] == 8 / 9  # no recommendation
+    assert "skipped_checks" not in accepted
+
+
+def test_adaptive_thresholds_follow_threshold_manager():
+    """Test adaptive thresholds reflect the current ThresholdManager, not a stale copy"""
+    evaluator = EvaluatorAgent({"thresholds": {"confidence_min": 0.6}})
+    volatile = evaluator._get_adaptive_thresholds({"quality_level": "volatile"})
+    assert volatile[2] == evaluator.base_min_evidence_count + evaluator.volatile_extra_evidence
+
+    evaluator.threshold_mgr = ThresholdManager({"thresholds": {"confidence_min": 0.8}})
+    assert evaluator._get_adaptive_thresholds({"quality_level": "volatile"})[0] > volatile[0]
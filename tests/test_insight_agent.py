@@ -3,6 +3,7 @@ Unit tests for InsightAgent
 Tests insight generation, confidence scoring, and validation
 """
 
+import json
 import unittest
 from unittest.mock import Mock, MagicMock
 from src.agents.insight_agent import InsightAgent
@@ -299,5 +300,51 @@ class TestInsightAgentEdgeCases(unittest.TestCase):
         self.assertIsInstance(insights, list)
 
 
+class TestInsightStreaming(unittest.TestCase):
+    """Test streaming insight generation"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_llm = Mock(spec=LLMClient)
+        self.mock_llm.model = "test-model"
+        self.agent = InsightAgent(self.mock_llm, Mock(), None, {})
+        self.data_context = {
+            "summary": {
+                "date_range": {"start": "2025-01-01", "end": "2025-01-31"},
+                "metrics": {"total_spend": 1000.0, "total_revenue": 2500.0, "avg_roas": 2.5, "avg_ctr": 0.012}
+            },
+            "time_series": {"recent_avg": 2.0, "previous_avg": 2.5, "change_pct": -20.0}
+        }
+
+    def test_stops_reading_after_max_insights(self):
+        """Test insights are yielded as they close and the stream is abandoned at max_insights"""
+        text = "```json\n" + json.dumps({"insights": [
+            {"id": "insight_1", "hypothesis": "CTR {fell} 20%", "confidence": 0.7},
+            {"id": "insight_2", "confidence": 0.6},
+            {"id": "insight_3", "confidence": 0.5}
+        ]}) + "\n```"
+        consumed = []
+
+        def stream(prompt, system_prompt):
+            for i in range(0, len(text), 7):
+                consumed.append(i)
+                yield text[i:i + 7]
+
+        self.mock_llm.stream.side_effect = stream
+
+        insights = list(self.agent.stream_insights([], self.data_context, max_insights=2))
+
+        self.assertEqual([i["id"] for i in insights], ["insight_1", "insight_2"])
+        self.assertLess(len(consumed) * 7, len(text))
+
+    def test_stream_falls_back_on_bad_json(self):
+        """Test unparseable streams use the regular fallback"""
+        self.mock_llm.stream.return_value = iter(["not ", "json"])
+
+        insights = list(self.agent.stream_insights([], self.data_context))
+
+        self.assertEqual(insights, self.agent._get_fallback_insights([]))
+
+
 if __name__ == "__main__":
     unittest.main()
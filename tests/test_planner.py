@@ -3,6 +3,8 @@ Unit tests for PlannerAgent
 Tests query planning, task generation, and adaptive threshold logic
 """
 
+import asyncio
+import json
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 from src.agents.planner import PlannerAgent
@@ -243,5 +245,101 @@ class TestPlannerAgent(unittest.TestCase):
         self.assertIn("thresholds", plan)
 
 
+class TestPlannerBatching(unittest.TestCase):
+    """Test batched planning of several queries"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_llm = Mock(spec=LLMClient)
+        self.mock_llm.model = "test-model"
+        self.planner = PlannerAgent(self.mock_llm, {}, Mock())
+        self.data_summary = {
+            "date_range": {"start": "2025-01-01", "end": "2025-01-31", "days": 30},
+            "campaigns": {"count": 3},
+            "metrics": {"total_spend": 1000.0, "avg_roas": 2.0, "avg_ctr": 0.012},
+            "dimensions": {"creative_types": {"Image": 5}, "platforms": {"Facebook": 5}, "countries": {"US": 5}}
+        }
+
+    def test_queries_share_one_call(self):
+        """Test one LLM call is split back into per-query plans, missing queries fall back"""
+        self.mock_llm.generate.return_value = json.dumps({"results": [
+            {"query_id": "2", "subtasks": [{"task_id": "b"}]},
+            {"query_id": "1", "subtasks": [{"task_id": "a"}]}
+        ]})
+
+        results = self.planner.plan_many([(q, self.data_summary) for q in ("A?", "B?", "C?")])
+
+        self.mock_llm.generate.assert_called_once()
+        prompt = self.mock_llm.generate.call_args[0][0]
+        self.assertIn("### QUERY 3", prompt)
+        section = prompt.split("### QUERY 1\n")[1].split("### QUERY 2")[0]
+        self.assertTrue(section.rstrip().endswith('User Query: "A?"'))  # dataset context first
+        self.assertEqual([r["plan"][0]["task_id"] for r in results[:2]], ["a", "b"])
+        self.assertEqual(results[2]["plan"], self.planner._get_default_plan())
+
+    def test_aplan_gathers_independent_queries(self):
+        """Test async planning awaits the LLM and parses each plan like plan()"""
+        self.mock_llm.agenerate.return_value = "```json\n" + json.dumps({"subtasks": [{"task_id": "1"}]}) + "\n```"
+
+        async def run():
+            return await asyncio.gather(*(self.planner.aplan(q, self.data_summary) for q in ("A?", "B?")))
+
+        results = asyncio.run(run())
+
+        self.assertEqual([r["plan"] for r in results], [[{"task_id": "1"}]] * 2)
+        self.assertEqual(self.mock_llm.agenerate.await_count, 2)
+        self.mock_llm.generate.assert_not_called()
+
+    def test_aplan_many_bounds_concurrency(self):
+        """Test concurrent planning keeps query order and caps calls in flight"""
+        in_flight, peak = [], []
+
+        async def agenerate(user_prompt, system_prompt, cache_query=None):
+            in_flight.append(1)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+            return json.dumps({"subtasks": [{"task_id": user_prompt.split('User Query: "')[1][0]}]})
+
+        self.mock_llm.agenerate.side_effect = agenerate
+        queries = [(q, self.data_summary) for q in ("A?", "B?", "C?", "D?")]
+
+        results = asyncio.run(self.planner.aplan_many(queries, max_concurrency=2))
+
+        self.assertEqual([r["plan"][0]["task_id"] for r in results], ["A", "B", "C", "D"])
+        self.assertEqual(max(peak), 2)
+
+    def test_stream_plan_yields_subtasks_before_stream_ends(self):
+        """Test subtasks are yielded as they close and the full plan is returned"""
+        text = json.dumps({"subtasks": [{"task_id": "1"}, {"task_id": "2"}]})
+        consumed = []
+
+        def stream(prompt, system_prompt):
+            for i in range(0, len(text), 5):
+                consumed.append(i)
+                yield text[i:i + 5]
+
+        self.mock_llm.stream.side_effect = stream
+        generator = self.planner.stream_plan("Why?", self.data_summary)
+
+        self.assertEqual(next(generator), {"task_id": "1"})
+        self.assertLess(len(consumed) * 5, len(text))
+        self.assertEqual(next(generator), {"task_id": "2"})
+        with self.assertRaises(StopIteration) as stop:
+            next(generator)
+        self.assertEqual(stop.exception.value["plan"], [{"task_id": "1"}, {"task_id": "2"}])
+
+    def test_prompt_prefix_is_query_independent(self):
+        """Test the query comes after the dataset context, keeping the prompt prefix stable"""
+        quality = self.planner._assess_data_quality(None, self.data_summary)
+        thresholds = self.planner._adapt_thresholds(quality)
+        first = self.planner._build_prompt("Why did ROAS drop?", self.data_summary, thresholds, quality)
+        second = self.planner._build_prompt("Which ads fatigued?", self.data_summary, thresholds, quality)
+
+        prefix = first[:first.index("User Query:")]
+        self.assertTrue(prefix.startswith("Dataset Context:"))
+        self.assertTrue(second.startswith(prefix))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -59,6 +59,14 @@ class TestThresholdManager(unittest.TestCase):
         threshold = self.manager.get_threshold("nonexistent")
         self.assertIsNotNone(threshold)  # Should return default
 
+    def test_cache_separates_adaptive_and_base(self):
+        """Test memoized thresholds don't mix adaptive and base lookups"""
+        adaptive = self.manager.get_threshold("confidence", data_quality="volatile")
+        base = self.manager.get_threshold("confidence", data_quality="volatile", use_adaptive=False)
+        self.assertLess(adaptive, base)
+        self.assertEqual(base, self.manager.get_threshold("confidence", use_adaptive=False))
+        self.assertEqual(adaptive, self.manager.get_threshold("confidence", data_quality="volatile"))
+
 
 class TestAlertSystem(unittest.TestCase):
     """Test Alert dataclass and helper functions"""
@@ -136,6 +144,77 @@ class TestStructuredLogger(unittest.TestCase):
         with logger.log_stage("test_stage"):
             pass  # Should not crash
 
+    def test_validation_batch_single_entry(self):
+        """Test a validation batch is written as one JSON line"""
+        import json
+        import tempfile
+        from src.utils.structured_logger import StructuredLogger
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log = StructuredLogger(f"{tmpdir}/run.jsonl")
+            log.log_validation_batch([
+                {"validation_type": "insight_roas", "passed": True, "details": {}},
+                {"validation_type": "insight_ctr", "passed": False, "details": {}}
+            ])
+            with open(f"{tmpdir}/run.jsonl", encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f]
+
+        self.assertEqual(len(entries), 2)  # session marker + batch
+        self.assertEqual(entries[1]["event"], "validation_batch")
+        self.assertEqual((entries[1]["count"], entries[1]["passed_count"]), (2, 1))
+        self.assertEqual(entries[1]["level"], "WARNING")
+
+    def test_level_gate_skips_lower_entries(self):
+        """Test entries below the configured level are not written"""
+        import json
+        import tempfile
+        from src.utils.structured_logger import StructuredLogger
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log = StructuredLogger(f"{tmpdir}/run.jsonl", level="WARNING")
+            log.log_agent_start("planner", {"user_query": "q"})
+            log.log_llm_call("planner", prompt="p", response="r")
+            log.log_retry_attempt("planner", 1, 3, "timeout")
+            with open(f"{tmpdir}/run.jsonl", encoding="utf-8") as f:
+                events = [json.loads(line)["event"] for line in f]
+
+        self.assertEqual(events, ["session_start", "retry_attempt"])
+
+    def test_batch_defers_writes_until_exit(self):
+        """Test entries logged inside batch() are written in order when it exits"""
+        import json
+        import tempfile
+        from src.utils.structured_logger import StructuredLogger
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/run.jsonl"
+            log = StructuredLogger(path)
+            with self.assertRaises(ValueError):
+                with log.batch():
+                    log.log_agent_start("planner", {"user_query": "q"})
+                    with log.batch():
+                        log.log_llm_call("planner", prompt="p", response="r")
+                    with open(path, encoding="utf-8") as f:
+                        self.assertEqual(len(f.readlines()), 1)  # session marker only
+                    raise ValueError("stage failed")
+            with open(path, encoding="utf-8") as f:
+                events = [json.loads(line)["event"] for line in f]
+
+        self.assertEqual(events, ["session_start", "start", "llm_call"])
+
+    def test_batch_flushes_when_full(self):
+        """Test a batch writes held-back entries once max_pending is reached"""
+        import tempfile
+        from src.utils.structured_logger import StructuredLogger
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = f"{tmpdir}/run.jsonl"
+            log = StructuredLogger(path, max_pending=2)
+            with log.batch():
+                log.log_agent_start("planner", {"user_query": "q"})
+                log.log_llm_call("planner", prompt="p", response="r")
+                log.log_agent_complete("planner", output_data={})
+                with open(path, encoding="utf-8") as f:
+                    self.assertEqual(len(f.readlines()), 3)  # marker + first two entries
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 4)
+
 
 class TestConfigLoader(unittest.TestCase):
     """Test config loading utility"""
@@ -145,6 +224,14 @@ class TestConfigLoader(unittest.TestCase):
         from src.utils.config import load_config
         self.assertIsNotNone(load_config)
 
+    def test_cached_config_returns_independent_copies(self):
+        """Test repeated loads are cached but callers can't mutate each other's config"""
+        from src.utils.config import load_config
+        first = load_config("config/config.yaml")
+        first["llm"]["model"] = "mutated"
+        second = load_config("config/config.yaml")
+        self.assertNotEqual(second["llm"]["model"], "mutated")
+
 
 class TestDataFrameOperations(unittest.TestCase):
     """Test basic DataFrame operations used in codebase"""
@@ -188,5 +275,190 @@ class TestDataFrameOperations(unittest.TestCase):
         self.assertIsNotNone(df["ctr"].iloc[0])
 
 
+class TestSemanticCache(unittest.TestCase):
+    """Test semantic LLM response cache"""
+
+    def setUp(self):
+        """Set up temp cache path"""
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = f"{self.tmpdir.name}/cache.pkl"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_hit_on_reworded_query(self):
+        """A reworded query over an otherwise identical prompt returns the cached response"""
+        from src.utils.semantic_cache import SemanticCache
+        cache = SemanticCache(threshold=0.8, path=self.path)
+        context = "Dataset: 367 campaigns, ROAS 2.1, spend $12,400. Instructions: return JSON subtasks. " * 5
+        query = "why did roas drop last week"
+        cache.add(context + query, '{"subtasks": []}', namespace="m", query=query)
+
+        reworded = "Why did ROAS drop last week?"
+        self.assertEqual(cache.get(context + reworded, namespace="m", query=reworded), '{"subtasks": []}')
+        self.assertIsNone(cache.get(context + reworded, namespace="other", query=reworded))
+        self.assertIsNone(cache.get(context.replace("2.1", "1.4") + reworded, namespace="m", query=reworded))
+
+    def test_different_query_same_template_misses(self):
+        """Queries sharing a long prompt template never answer each other"""
+        from src.utils.semantic_cache import SemanticCache
+        cache = SemanticCache(threshold=0.5, path=None)
+        context = "Dataset: 367 campaigns, ROAS 2.1. Instructions: return JSON subtasks. " * 20
+        cache.add(context + "Why did ROAS drop last week?", "roas plan", namespace="m", query="Why did ROAS drop last week?")
+
+        query = "Compare performance across platforms"
+        self.assertIsNone(cache.get(context + query, namespace="m", query=query))
+        self.assertIsNone(cache.get(context + "Why did ROAS drop in the last 30 days?", namespace="m",
+                                    query="Why did ROAS drop in the last 30 days?"))
+
+    def test_without_query_only_identical_prompts_hit(self):
+        """Without a query the whole prompt must match exactly"""
+        from src.utils.semantic_cache import SemanticCache
+        cache = SemanticCache(threshold=0.5, path=None)
+        prompt = "Generate creatives for campaigns with low CTR: Men Bold Colors, Women Seamless. " * 5
+        cache.add(prompt, "creatives", namespace="m")
+
+        self.assertEqual(cache.get(prompt, namespace="m"), "creatives")
+        self.assertIsNone(cache.get(prompt + " Thanks", namespace="m"))
+        self.assertEqual(len(cache), 1)
+
+    def test_persists_across_instances(self):
+        """Entries are reloaded from disk"""
+        from src.utils.semantic_cache import SemanticCache
+        cache = SemanticCache(path=self.path)
+        cache.add("same prompt", "cached", namespace="m")
+        cache.flush()
+        self.assertEqual(SemanticCache(path=self.path).get("same prompt", namespace="m"), "cached")
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test exact-match cache for parsed agent results"""
+
+    def test_key_ignores_dict_order(self):
+        """Equal inputs hash to the same key regardless of dict ordering"""
+        from src.utils.response_cache import InMemoryCache
+        self.assertEqual(
+            InMemoryCache.make_key({"a": 1, "b": [1, 2]}, "query"),
+            InMemoryCache.make_key({"b": [1, 2], "a": 1}, "query")
+        )
+        self.assertNotEqual(InMemoryCache.make_key({"a": 1}), InMemoryCache.make_key({"a": 2}))
+
+    def test_lru_eviction_and_copies(self):
+        """Least recently used entry is evicted; hits are independent copies"""
+        from src.utils.response_cache import InMemoryCache
+        cache = InMemoryCache(max_entries=2)
+        cache.update("a", [{"id": 1}])
+        cache.update("b", [{"id": 2}])
+        cache.lookup("a")[0]["id"] = 99
+        cache.update("c", [{"id": 3}])
+
+        self.assertEqual(cache.lookup("a"), [{"id": 1}])
+        self.assertIsNone(cache.lookup("b"))
+
+    def test_new_data_version_invalidates(self):
+        """A newer dataset end date drops entries cached for older data"""
+        from src.utils.response_cache import InMemoryCache
+        cache = InMemoryCache()
+        cache.update("k", ["plan"], version="2024-03-31")
+        self.assertEqual(cache.lookup("k", version="2024-03-31"), ["plan"])
+        self.assertIsNone(cache.lookup("k", version="2024-04-30"))
+
+    def test_disabled_when_sampling(self):
+        """No cache is built unless enabled with temperature 0"""
+        from src.utils.response_cache import ResponseCache, build_response_cache
+        enabled = {"response_cache": {"enabled": True}}
+        self.assertIsNone(build_response_cache({"llm": {**enabled, "temperature": 0.5}}))
+        self.assertIsNone(build_response_cache({"llm": {"temperature": 0}}))
+        self.assertIsInstance(build_response_cache({"llm": {**enabled, "temperature": 0}}), ResponseCache)
+
+    def test_near_duplicate_query_needs_same_context(self):
+        """Semantic layer matches reworded queries only over identical inputs"""
+        from src.utils.response_cache import InMemoryCache, ResponseCache, SemanticResponseCache
+        cache = ResponseCache(InMemoryCache(), SemanticResponseCache(threshold=0.8))
+        context = ({"roas": 2.1}, {"threshold": 0.1})
+        cache.update("why did roas drop last week", context, ["plan"])
+        
+        self.assertEqual(cache.lookup("why did ROAS drop last week?", context), ["plan"])
+        self.assertIsNone(cache.lookup("why did roas drop last week", ({"roas": 2.2}, {"threshold": 0.1})))
+        self.assertIsNone(cache.lookup("which creatives should we refresh", context))
+        self.assertEqual(cache.stats, {"hits": 1, "misses": 2, "semantic_hits": 1})
+
+    def test_near_duplicate_query_needs_same_parameters(self):
+        """Queries differing in timeframe, numbers or negation never match"""
+        from src.utils.response_cache import InMemoryCache, ResponseCache, SemanticResponseCache
+        cache = ResponseCache(InMemoryCache(), SemanticResponseCache(threshold=0.8))
+        context = ({"roas": 2.1},)
+        cache.update("why did roas drop in the last 7 days", context, ["7-day plan"])
+
+        self.assertIsNone(cache.lookup("why did roas drop in the last 30 days", context))
+        self.assertIsNone(cache.lookup("why did roas not drop in the last 7 days", context))
+        self.assertIsNone(cache.lookup("why did roas drop in the last 7 weeks", context))
+        self.assertEqual(cache.lookup("Why did ROAS drop in the last 7 days?", context), ["7-day plan"])
+
+
+class TestLLMClientSession(unittest.TestCase):
+    """Test HTTP connection reuse in LLMClient"""
+
+    def test_clients_share_pooled_session(self):
+        """Clients reuse one session unless another is injected"""
+        from unittest.mock import MagicMock
+        from src.utils.llm import LLMClient
+        first = LLMClient({"api_key": "test"})
+        self.assertIs(first.session, LLMClient({"api_key": "test"}).session)
+
+        session = MagicMock()
+        session.post.return_value.status_code = 200
+        session.post.return_value.json.return_value = {"choices": [{"message": {"content": "ok"}}]}
+        client = LLMClient({"api_key": "test"}, session=session)
+        self.assertEqual(client.generate("hi"), "ok")
+        session.post.assert_called_once()
+
+    def test_semantic_cache_needs_zero_temperature(self):
+        """The semantic cache is only used for deterministic sampling"""
+        import tempfile
+        from src.utils.llm import LLMClient
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_config = {"enabled": True, "path": f"{tmpdir}/cache.pkl"}
+            self.assertIsNone(LLMClient({"api_key": "test", "temperature": 0.5, "cache": cache_config}).cache)
+            self.assertIsNotNone(LLMClient({"api_key": "test", "temperature": 0, "cache": cache_config}).cache)
+
+    def test_stream_error_status_releases_connection(self):
+        """An error status from a streamed request still closes the response"""
+        from unittest.mock import MagicMock
+        from src.utils.exceptions import LLMAPIError
+        from src.utils.llm import LLMClient
+        session = MagicMock()
+        session.post.return_value.status_code = 429
+        client = LLMClient({"api_key": "test"}, session=session)
+
+        with self.assertRaises(LLMAPIError):
+            list(client.stream("hi"))
+        session.post.return_value.__exit__.assert_called_once()
+
+
+class TestStripCodeFence(unittest.TestCase):
+    """Test JSON extraction from markdown-fenced LLM responses"""
+
+    def test_fenced_and_plain_responses(self):
+        """Fenced (json or bare, closed or truncated) and plain responses yield the JSON"""
+        from src.utils.llm import strip_code_fence
+        payload = '{"insights": []}'
+        self.assertEqual(strip_code_fence(f"```json\n{payload}\n```"), payload)
+        self.assertEqual(strip_code_fence(f"Here you go:\n```\n{payload}\n```\nDone"), payload)
+        self.assertEqual(strip_code_fence(f"```json\n{payload}"), payload)
+        self.assertEqual(strip_code_fence(payload), payload)
+
+    def test_parse_json_wrapped_in_prose(self):
+        """JSON surrounded by prose is decoded up to its matching brace"""
+        import orjson
+        from src.utils.llm import parse_json_response
+        response = 'Sure! {"insights": [{"hypothesis": "CTR {fell}"}]} Let me know if you need more.'
+        self.assertEqual(parse_json_response(response), {"insights": [{"hypothesis": "CTR {fell}"}]})
+        self.assertEqual(parse_json_response('```json\n{"a": 1}\n```'), {"a": 1})
+        with self.assertRaises(orjson.JSONDecodeError):
+            parse_json_response("no json here")
+
+
 if __name__ == "__main__":
     unittest.main()